@@ -1,21 +1,28 @@
-import time
-import numpy as np
-from dashcoch import DataLoader, StyleLoader
+import os
+import hmac
+import gzip
+import hashlib
+import threading
+from functools import wraps
+from dashcoch import DataStore, FigureCache, Scheduler, StyleLoader
+from dashcoch.metrics import METRICS, SIZE_BUCKETS
+from dashcoch.downsample import downsample_figure
 import math
-from datetime import date, datetime, timedelta
 import json
-import geojson
 import flask
 import dash
+import plotly
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
 from dash.dependencies import Input, Output, State, ClientsideFunction
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-from dashcoch.config import config as cfg
-from flask_caching import Cache
+from dash.exceptions import PreventUpdate
+from concurrent.futures import ThreadPoolExecutor
+from dashcoch.config import freeze
 
 
+cfg = freeze()
+
 external_scripts = [
     "https://cdn.simpleanalytics.io/hello.js",
 ]
@@ -24,13 +31,13 @@ lang = 0
 
 meta_tags = [
     {"name": "viewport", "content": "width=device-width, initial-scale=1"},
-    {"property": "og:title", "content": cfg["i18n"]["title"][lang].get()},
+    {"property": "og:title", "content": cfg.i18n[lang]["title"]},
     {"property": "og:type", "content": "website"},
     {
         "property": "og:description",
         "content": "Latest updates of COVID-19 development in Switzerland",
     },
-    {"property": "og:url", "content": cfg["i18n"]["description"][lang].get()},
+    {"property": "og:url", "content": cfg.i18n[lang]["description"]},
     {
         "property": "og:image",
         "content": "https://www.corona-data.ch/assets/embed-social-414x414.jpg",
@@ -45,34 +52,145 @@ app = dash.Dash(
 )
 server = app.server
 
-app.title = cfg["i18n"]["title"][lang].get()
+app.title = cfg.i18n[lang]["title"]
 style = StyleLoader(cfg)
 
 
-def get_data():
-    global data
-    try:
-        data = DataLoader(cfg)
-    except Exception as e:
-        print(e)
+# When started by gunicorn, a separate process loads the data and shares it
+# with all workers (see gunicorn.conf.py)
+data_store = DataStore(
+    cfg,
+    directory=os.environ.get("DASHCOCH_DATA_STORE"),
+    snapshot=cfg.settings.snapshot,
+)
+
+# The metrics of all workers and the data loader process are added up
+if data_store.directory is not None:
+    METRICS.share(os.path.join(data_store.directory, "metrics"))
+
+METRICS.histogram("dashcoch_callback_duration_seconds", "Duration of the callbacks")
+METRICS.counter(
+    "dashcoch_callback_exceptions_total", "Exceptions raised by the callbacks"
+)
+METRICS.histogram(
+    "dashcoch_callback_response_bytes",
+    "Size of the responses of the callbacks",
+    SIZE_BUCKETS,
+)
+METRICS.histogram(
+    "dashcoch_layout_build_duration_seconds",
+    "Duration of building the layouts of a data generation",
+)
+
+
+# Figures only depend on the data snapshot, the language and the inputs of
+# their callback, so they are built once and then taken from the cache
+figure_cache = FigureCache(
+    cfg, server, context=lambda: (data_store.get().snapshot_id, get_lang())
+)
+
+
+# Refreshes the data in this process, unless it is loaded by a separate one.
+# Otherwise it only passes on the manual refresh requests.
+scheduler = Scheduler(cfg, data_store)
+
+
+# The data of the last run is served until the scheduler refreshed it.
+# Without it, the lazy sections are left out at startup, so the core data can
+# be served as soon as possible. They are added to the layout once they are
+# built. Workers only wait a moment for the data loader process, so they boot
+# and answer /ready with a 503 while it cannot get the core data.
+if data_store.directory is None:
+    if not data_store.restore():
+        data_store.refresh(defer=True)
+else:
+    data_store.wait(timeout=5)
+
+
+# The data of the clientside map is serialized once per data generation and
+# served with its content hash in the URL, so browsers and CDNs can keep it
+def get_map_data_url(data):
+    return "/data/map-" + data.map_data_hash + ".json"
+
+
+@server.route("/data/map-<content_hash>.json")
+def serve_map_data(content_hash):
+    data = data_store.get()
+    # Not loaded yet, or deferred to the next generation
+    if data is None or "map_data" in data.pending:
+        return flask.jsonify(error="The map data is not loaded yet"), 503
+    if not hasattr(data, "map_data"):
+        flask.abort(404)
+
+    if content_hash != data.map_data_hash:
+        return flask.redirect(get_map_data_url(data))
+
+    # Both encodings are prepared in advance, each with its own strong ETag
+    if "gzip" in flask.request.accept_encodings:
+        response = flask.Response(data.map_data_gzip, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(data.map_data_hash + "-gzip")
+    else:
+        response = flask.Response(data.map_data, mimetype="application/json")
+        response.set_etag(data.map_data_hash)
+
+    response.headers["Vary"] = "Accept-Encoding"
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    return response.make_conditional(flask.request)
+
+
+# Ready as soon as the core data is loaded, the sections still being built are
+# listed as pending
+@server.route("/ready")
+def ready():
+    data = data_store.get()
+    if data is None:
+        return flask.jsonify(ready=False), 503
+
+    return flask.jsonify(
+        ready=True,
+        complete=not data.pending,
+        pending=list(data.pending),
+        generation=data.generation,
+    )
+
+
+# The nodes that failed to build and the state of every source, a failing
+# source is served from its last good copy until it recovers
+@server.route("/status")
+def status():
+    data = data_store.get()
+    return flask.jsonify(
+        generation=data.generation if data is not None else None,
+        failed=data.failed if data is not None else {},
+        **data_store.get_status(),
+    )
 
 
-def update_data(period=int(cfg["settings"]["update_interval"].get())):
-    while True:
-        get_data()
-        print("Data updated at " + datetime.now().isoformat())
-        time.sleep(period)
+# Refreshes all sources right away. Only available with a token set in the
+# DASHCOCH_REFRESH_TOKEN environment variable, which has to be sent as a
+# bearer token.
+@server.route("/refresh", methods=["POST"])
+def refresh_now():
+    token = os.environ.get("DASHCOCH_REFRESH_TOKEN")
+    if not token:
+        flask.abort(404)
 
+    authorization = flask.request.headers.get("Authorization", "")
+    if not hmac.compare_digest(authorization.encode(), ("Bearer " + token).encode()):
+        return flask.jsonify(error="Unauthorized"), 401
 
-get_data()
+    scheduler.trigger()
+    return flask.jsonify(requested=True), 202
 
 
 def get_lang():
     try:
         if not flask.has_request_context():
-            return cfg["settings"]["default_language"].get()
+            return cfg.settings.default_language
 
-        supported_languages = cfg["settings"]["languages"].get()
+        supported_languages = cfg.settings.languages
 
         if "Referer" in flask.request.headers:
             url_lang = flask.request.headers["Referer"].split("/")[-1]
@@ -83,10 +201,10 @@ def get_lang():
         if candidate in supported_languages:
             return supported_languages.index(candidate)
         else:
-            return cfg["settings"]["default_language"].get()
+            return cfg.settings.default_language
 
     except:
-        lang = cfg["settings"]["default_language"].get()
+        lang = cfg.settings.default_language
 
 
 # -------------------------------------------------------------------------------
@@ -253,12 +371,85 @@ phase_annotations_double_height = [
 ]
 
 
-def get_layout():
-    lang = get_lang()
+# The figures that only change with the data generation and the language. They
+# are built together with the layout (see build_layout) and the browser sets
+# the scale of the given axes and picks the selected regions, either keeping
+# the order of the traces or following the order of the selection. Their line
+# traces are reduced to a budget of points along x (settings.downsample_points
+# unless given, 0 keeps all of them).
+static_figures = {}
+
+
+def static_figure(
+    graph_id,
+    scale_input="radio-scale-switzerland",
+    axes=("yaxis",),
+    regions=None,
+    points=None,
+):
+    def decorator(f):
+        static_figures[graph_id] = {
+            "build": f,
+            "scale_input": scale_input,
+            "axes": axes,
+            "regions": regions,
+            "points": points,
+        }
+        return f
+
+    return decorator
+
+
+# The static figures of a layout are built in one pass, all from the same data
+# snapshot and in the same language. With settings.figure_workers set, they
+# are built by that many threads.
+figure_executor = None
+if cfg.settings.figure_workers:
+    figure_executor = ThreadPoolExecutor(max_workers=cfg.settings.figure_workers)
+
+
+def build_static_figures(lang, data, graph_ids):
+    def build(graph_id):
+        static = static_figures[graph_id]
+        figure = static["build"](lang, data)
+
+        points = static["points"]
+        if points is None:
+            points = cfg.settings.downsample_points
+        if points:
+            downsample_figure(figure, points)
+
+        return {
+            "figure": figure,
+            "scale_input": static["scale_input"],
+            "axes": static["axes"],
+            "regions": static["regions"],
+        }
+
+    if figure_executor is None:
+        figures = map(build, graph_ids)
+    else:
+        figures = figure_executor.map(build, graph_ids)
+
+    return dict(zip(graph_ids, figures))
+
+
+def build_layout(lang, data):
+    # Only a notice before the first data is loaded
+    if data is None:
+        return dbc.Container(
+            id="main",
+            children=[
+                html.H3(children=cfg.i18n[lang]["title"]),
+                html.P(children=cfg.i18n[lang]["data_loading"]),
+            ],
+            fluid=True,
+        )
+
     content = [dcc.Location(id="url", refresh=False)]
 
     # Header
-    if cfg["show"]["header"]:
+    if cfg.show.header:
         content.extend(
             [
                 html.Div(
@@ -272,18 +463,18 @@ def get_layout():
                                     refresh=True,
                                     href="/" + l,
                                 )
-                                for l in cfg["settings"]["languages"].get()
+                                for l in cfg.settings.languages
                             ],
                         ),
                         html.Img(
-                            src=cfg["logo"]["src"].get(),
+                            src=cfg.logo.src,
                             style={
-                                "width": cfg["logo"]["width"].get(),
-                                "display": cfg["logo"]["display"].get(),
+                                "width": cfg.logo.width,
+                                "display": cfg.logo.display,
                             },
                         ),
-                        html.H3(children=cfg["i18n"]["title"][lang].get()),
-                        # html.Div(id="muy-importante", children=[dcc.Markdown(cfg["i18n"]["important"][lang].get())]),
+                        html.H3(children=cfg.i18n[lang]["title"]),
+                        # html.Div(id="muy-importante", children=[dcc.Markdown(cfg.i18n[lang]["important"])]),
                         dbc.Button(
                             "Info",
                             id="info-button",
@@ -296,20 +487,16 @@ def get_layout():
                             children=[
                                 html.P(
                                     children=(
-                                        [dcc.Markdown(cfg["i18n"]["info"][lang].get())]
-                                        if cfg["show"]["info"].get()
+                                        [dcc.Markdown(cfg.i18n[lang]["info"])]
+                                        if cfg.show.info
                                         else []
                                     )
                                 ),
                                 html.P(
                                     id="sci-info",
                                     children=(
-                                        [
-                                            dcc.Markdown(
-                                                cfg["i18n"]["more_info"][lang].get()
-                                            )
-                                        ]
-                                        if cfg["show"]["more_info"].get()
+                                        [dcc.Markdown(cfg.i18n[lang]["more_info"])]
+                                        if cfg.show.more_info
                                         else []
                                     ),
                                 ),
@@ -322,7 +509,7 @@ def get_layout():
         )
 
     # Totals
-    if cfg["show"]["totals"]:
+    if cfg.show.totals:
         content.extend(
             [
                 dbc.Row(
@@ -333,9 +520,7 @@ def get_layout():
                                 children=[
                                     html.P(
                                         className="total-title",
-                                        children=cfg["i18n"]["total_reported_cases"][
-                                            lang
-                                        ].get(),
+                                        children=cfg.i18n[lang]["total_reported_cases"],
                                     ),
                                     html.Div(
                                         className="total-content",
@@ -353,9 +538,7 @@ def get_layout():
                                 children=[
                                     html.P(
                                         className="total-title",
-                                        children=cfg["i18n"]["reported_cases_today"][
-                                            lang
-                                        ].get(),
+                                        children=cfg.i18n[lang]["reported_cases_today"],
                                     ),
                                     html.Div(
                                         className="total-content",
@@ -373,9 +556,7 @@ def get_layout():
                                 children=[
                                     html.P(
                                         className="total-title",
-                                        children=cfg["i18n"]["total_fatalities"][
-                                            lang
-                                        ].get(),
+                                        children=cfg.i18n[lang]["total_fatalities"],
                                     ),
                                     html.Div(
                                         className="total-content",
@@ -393,9 +574,9 @@ def get_layout():
                                 children=[
                                     html.P(
                                         className="total-title",
-                                        children=cfg["i18n"]["regions_updated_today"][
-                                            lang
-                                        ].get(),
+                                        children=cfg.i18n[lang][
+                                            "regions_updated_today"
+                                        ],
                                     ),
                                     html.Div(
                                         className="total-content",
@@ -418,7 +599,7 @@ def get_layout():
         )
 
     # Updated regions
-    if cfg["show"]["updates"]:
+    if cfg.show.updates:
         content.extend(
             [
                 html.Div(
@@ -426,7 +607,7 @@ def get_layout():
                     children=[
                         html.Div(
                             className="update-title",
-                            children=cfg["i18n"]["latest_updates"][lang].get(),
+                            children=cfg.i18n[lang]["latest_updates"],
                         ),
                         html.Div(
                             className="update-content",
@@ -448,10 +629,16 @@ def get_layout():
         )
 
     # Map
-    if cfg["show"]["map"]:
+    if cfg.show.map and "map_data" not in data.pending:
         content.extend(
             [
-                html.Div(id="map-data", style={"display": "none"}),
+                html.Div(
+                    id="map-data",
+                    children=get_map_data_url(data),
+                    style={"display": "none"},
+                ),
+                # Clicked by client_side_callbacks.js once the map data has arrived
+                html.Button(id="map-data-loaded", style={"display": "none"}),
                 html.Div(id="date-container", className="slider-container"),
                 html.Div(
                     children=[
@@ -470,45 +657,39 @@ def get_layout():
                                     id="map-radios",
                                     options=[
                                         {
-                                            "label": cfg["i18n"]["new_cases"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["new_cases"],
                                             "value": "new",
                                         },
                                         {
-                                            "label": cfg["i18n"][
+                                            "label": cfg.i18n[lang][
                                                 "total_reported_cases"
-                                            ][lang].get(),
+                                            ],
                                             "value": "number",
                                         },
                                         {
-                                            "label": cfg["i18n"][
+                                            "label": cfg.i18n[lang][
                                                 "cumulative_prevalence"
-                                            ][lang].get(),
+                                            ],
                                             "value": "prevalence",
                                         },
                                         {
-                                            "label": cfg["i18n"][
+                                            "label": cfg.i18n[lang][
                                                 "new_hospitalizations"
-                                            ][lang].get(),
+                                            ],
                                             "value": "new_hospitalizations",
                                         },
                                         {
-                                            "label": cfg["i18n"][
+                                            "label": cfg.i18n[lang][
                                                 "total_hospitalizations"
-                                            ][lang].get(),
+                                            ],
                                             "value": "hospitalizations",
                                         },
                                         {
-                                            "label": cfg["i18n"]["new_fatalities"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["new_fatalities"],
                                             "value": "new_fatalities",
                                         },
                                         {
-                                            "label": cfg["i18n"]["total_fatalities"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["total_fatalities"],
                                             "value": "fatalities",
                                         },
                                     ],
@@ -524,9 +705,9 @@ def get_layout():
                     children=[
                         html.P(
                             className="slider-text",
-                            children=cfg["i18n"]["drag_the_slider_to_change_the_date"][
-                                lang
-                            ].get(),
+                            children=cfg.i18n[lang][
+                                "drag_the_slider_to_change_the_date"
+                            ],
                         ),
                         dcc.Slider(
                             id="slider-date",
@@ -546,7 +727,7 @@ def get_layout():
         )
 
     # Regional heatmap
-    if cfg["show"]["region_overview"]:
+    if cfg.show.region_overview and "region_boxes" not in data.pending:
         content.extend(
             [
                 dbc.Row(
@@ -555,9 +736,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_regional_overview_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="region-boxes",
@@ -576,12 +757,12 @@ def get_layout():
         )
 
     # Links to regional websites
-    if cfg["show"]["region_links"]:
+    if cfg.show.region_links:
         content.extend(
             [
                 html.Div(
                     className="plot-title",
-                    children=cfg["i18n"]["regional_data"][lang].get(),
+                    children=cfg.i18n[lang]["regional_data"],
                 ),
                 html.Div(
                     id="regional-links-container",
@@ -594,7 +775,7 @@ def get_layout():
                                 html.Span(children=" "),
                             ]
                         )
-                        for region in cfg["regions"].get()
+                        for region in cfg.regions
                         if "detail" in region
                     ],
                 ),
@@ -603,16 +784,16 @@ def get_layout():
         )
 
     # Main Data
-    if cfg["show"]["main"]:
+    if cfg.show.main:
         content.extend(
             [
                 html.H4(
-                    children=cfg["i18n"]["main_data_title"][lang].get(),
+                    children=cfg.i18n[lang]["main_data_title"],
                     style={"color": style.theme["accent"]},
                 ),
                 html.Div(
                     className="info-container",
-                    children=cfg["i18n"]["info_main"][lang].get(),
+                    children=cfg.i18n[lang]["info_main"],
                 ),
                 html.Div(
                     className="plot-settings-container",
@@ -623,15 +804,11 @@ def get_layout():
                                     id="radio-scale-switzerland",
                                     options=[
                                         {
-                                            "label": cfg["i18n"]["linear_scale"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["linear_scale"],
                                             "value": "linear",
                                         },
                                         {
-                                            "label": cfg["i18n"]["log_scale"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["log_scale"],
                                             "value": "log",
                                         },
                                     ],
@@ -649,9 +826,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_total_reported_cases_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="case-ch-graph", config={"displayModeBar": False}
@@ -664,9 +841,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_total_fatalities_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="fatalities-ch-graph",
@@ -685,9 +862,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_daily_reported_cases_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="new-case-ch-graph",
@@ -701,9 +878,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_daily_fatalities_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="new-fatalities-ch-graph",
@@ -720,7 +897,12 @@ def get_layout():
         )
 
     # Hospitalization Data
-    if cfg["show"]["hospitalizations"] and cfg["show"]["hospital_releases"]:
+    if (
+        cfg.show.hospitalizations
+        and cfg.show.hospital_releases
+        and "hospitalizations" not in data.pending
+        and "releases" not in data.pending
+    ):
         content.extend(
             [
                 dbc.Row(
@@ -729,9 +911,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_hospitalizations_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="hospitalizations-ch-graph",
@@ -745,9 +927,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_releases_country_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang][
+                                        "plot_releases_country_title"
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="releases-ch-graph",
@@ -763,7 +945,11 @@ def get_layout():
             ]
         )
 
-    if cfg["show"]["hospitalizations"] and not cfg["show"]["hospital_releases"]:
+    if (
+        cfg.show.hospitalizations
+        and not cfg.show.hospital_releases
+        and "hospitalizations" not in data.pending
+    ):
         content.extend(
             [
                 dbc.Row(
@@ -772,9 +958,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_hospitalizations_country_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="hospitalizations-ch-graph",
@@ -789,7 +975,7 @@ def get_layout():
         )
 
     # Log-Log Development Plot
-    if cfg["show"]["log_log_development"]:
+    if cfg.show.log_log_development:
         content.extend(
             [
                 dbc.Row(
@@ -798,15 +984,13 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_loglog_country_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang][
+                                        "plot_loglog_country_title"
+                                    ],
                                 ),
                                 html.Div(
                                     className="info-container",
-                                    children=cfg["i18n"]["info_log_log_main"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["info_log_log_main"],
                                 ),
                                 dcc.Graph(
                                     id="caseincrease-ch-graph",
@@ -821,7 +1005,7 @@ def get_layout():
         )
 
     # Age Distribution
-    if cfg["show"]["tests"]:
+    if cfg.show.tests and "tests" not in data.pending:
         content.extend(
             [
                 dbc.Row(
@@ -830,9 +1014,7 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_tests_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["plot_tests_title"],
                                 ),
                                 dcc.Graph(
                                     id="tests-graph",
@@ -841,9 +1023,9 @@ def get_layout():
                                             {
                                                 "x": data.tests.index,
                                                 "y": data.tests["neg"],
-                                                "name": cfg["i18n"]["plot_tests_neg"][
-                                                    lang
-                                                ].get(),
+                                                "name": cfg.i18n[lang][
+                                                    "plot_tests_neg"
+                                                ],
                                                 "mode": "lines",
                                                 "marker": {
                                                     "color": style.theme["green"]
@@ -852,9 +1034,9 @@ def get_layout():
                                             {
                                                 "x": data.tests.index,
                                                 "y": data.tests["pos"],
-                                                "name": cfg["i18n"]["plot_tests_pos"][
-                                                    lang
-                                                ].get(),
+                                                "name": cfg.i18n[lang][
+                                                    "plot_tests_pos"
+                                                ],
                                                 "mode": "lines",
                                                 "marker": {"color": style.theme["red"]},
                                             },
@@ -864,18 +1046,14 @@ def get_layout():
                                             "xaxis": {
                                                 "showgrid": True,
                                                 "color": "#ffffff",
-                                                "title": cfg["i18n"]["plot_tests_x"][
-                                                    lang
-                                                ].get(),
+                                                "title": cfg.i18n[lang]["plot_tests_x"],
                                             },
                                             "yaxis": {
                                                 "type": "linear",
                                                 "showgrid": True,
                                                 "color": "#ffffff",
                                                 "rangemode": "tozero",
-                                                "title": cfg["i18n"]["plot_tests_y"][
-                                                    lang
-                                                ].get(),
+                                                "title": cfg.i18n[lang]["plot_tests_y"],
                                             },
                                             "legend": {
                                                 "x": 0.015,
@@ -914,9 +1092,7 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_tests_ratio_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["plot_tests_ratio_title"],
                                 ),
                                 dcc.Graph(
                                     id="tests-ratio-graph",
@@ -940,9 +1116,9 @@ def get_layout():
                                                 "marker": {
                                                     "color": style.theme["foreground"]
                                                 },
-                                                "name": cfg["i18n"]["moving_average"][
-                                                    lang
-                                                ].get(),
+                                                "name": cfg.i18n[lang][
+                                                    "moving_average"
+                                                ],
                                                 "hovertemplate": "%{y} %<extra></extra>",
                                                 "showlegend": True,
                                                 "fill": "tozeroy",
@@ -953,18 +1129,18 @@ def get_layout():
                                             "xaxis": {
                                                 "showgrid": True,
                                                 "color": "#ffffff",
-                                                "title": cfg["i18n"][
+                                                "title": cfg.i18n[lang][
                                                     "plot_tests_ratio_x"
-                                                ][lang].get(),
+                                                ],
                                             },
                                             "yaxis": {
                                                 "type": "linear",
                                                 "showgrid": True,
                                                 "color": "#ffffff",
                                                 "rangemode": "tozero",
-                                                "title": cfg["i18n"][
+                                                "title": cfg.i18n[lang][
                                                     "plot_tests_ratio_y"
-                                                ][lang].get(),
+                                                ],
                                             },
                                             "legend": {
                                                 "x": 0.015,
@@ -1006,7 +1182,7 @@ def get_layout():
         )
 
     # International Data
-    if cfg["show"]["international"]:
+    if cfg.show.international and "world" not in data.pending:
         content.extend(
             [
                 dbc.Row(
@@ -1015,9 +1191,7 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_world_cases_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["plot_world_cases_title"],
                                 ),
                                 dcc.Graph(
                                     id="cases-world-graph",
@@ -1031,9 +1205,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_world_fatalities_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang][
+                                        "plot_world_fatalities_title"
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="fatalities-world-graph",
@@ -1051,9 +1225,7 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_world_tests_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["plot_world_tests_title"],
                                 ),
                                 dcc.Graph(
                                     id="new-tests-world-graph",
@@ -1067,9 +1239,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_world_positivity_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang][
+                                        "plot_world_positivity_title"
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="test-positivity-world-graph",
@@ -1087,15 +1259,15 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_tests_vs_positivity_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 html.Div(
                                     className="info-container",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "info_plot_tests_vs_positivity"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="tests-vs-positivity-world-graph",
@@ -1112,24 +1284,24 @@ def get_layout():
         )
 
     # Age Distribution
-    if cfg["show"]["age_distribution"]:
+    if cfg.show.age_distribution and "age_distribution" not in data.pending:
         content.extend(
             [
                 html.H4(
-                    children=cfg["i18n"]["age_distribution_title"][lang].get(),
+                    children=cfg.i18n[lang]["age_distribution_title"],
                     className="secondary",
                     style={"color": style.theme["accent_secondary"]},
                 ),
                 html.Div(
                     className="info-container",
-                    children=cfg["i18n"]["info_age_distribution"][lang].get(),
+                    children=cfg.i18n[lang]["info_age_distribution"],
                 ),
                 html.Div(
                     className="plot-settings-container",
                     children=[
                         html.P(
                             className="slider-text",
-                            children=cfg["i18n"]["show_data_for"][lang].get(),
+                            children=cfg.i18n[lang]["show_data_for"],
                         ),
                         dbc.FormGroup(
                             [
@@ -1137,12 +1309,10 @@ def get_layout():
                                     id="select-regions-ch",
                                     options=[
                                         {"label": region, "value": region}
-                                        for region in [
-                                            cfg["settings"]["total_column_name"].get()
-                                        ]
+                                        for region in [cfg.settings.total_column_name]
                                         + data.region_labels
                                     ],
-                                    value=cfg["settings"]["total_column_name"].get(),
+                                    value=cfg.settings.total_column_name,
                                     clearable=False,
                                 ),
                             ]
@@ -1158,15 +1328,13 @@ def get_layout():
                                     id="radio-absolute-norm",
                                     options=[
                                         {
-                                            "label": cfg["i18n"]["absolute_numbers"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["absolute_numbers"],
                                             "value": "absolute",
                                         },
                                         {
-                                            "label": cfg["i18n"]["scaled_by_age_dist"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang][
+                                                "scaled_by_age_dist"
+                                            ],
                                             "value": "scaled",
                                         },
                                     ],
@@ -1221,16 +1389,16 @@ def get_layout():
         )
 
     # Region Data
-    if cfg["show"]["regional"]:
+    if cfg.show.regional:
         content.extend(
             [
                 html.H4(
-                    children=cfg["i18n"]["regional_data_title"][lang].get(),
+                    children=cfg.i18n[lang]["regional_data_title"],
                     style={"color": style.theme["accent"]},
                 ),
                 html.Div(
                     className="info-container",
-                    children=cfg["i18n"]["info_regional"][lang].get(),
+                    children=cfg.i18n[lang]["info_regional"],
                 ),
                 html.Div(
                     className="plot-settings-container",
@@ -1241,15 +1409,11 @@ def get_layout():
                                     id="radio-scale-regions",
                                     options=[
                                         {
-                                            "label": cfg["i18n"]["linear_scale"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["linear_scale"],
                                             "value": "linear",
                                         },
                                         {
-                                            "label": cfg["i18n"]["log_scale"][
-                                                lang
-                                            ].get(),
+                                            "label": cfg.i18n[lang]["log_scale"],
                                             "value": "log",
                                         },
                                     ],
@@ -1277,9 +1441,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_cases_regional_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang][
+                                        "plot_cases_regional_title"
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="case-graph", config={"displayModeBar": False}
@@ -1292,9 +1456,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_cases_pc_regional_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="case-pc-graph", config={"displayModeBar": False}
@@ -1312,9 +1476,9 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"][
+                                    children=cfg.i18n[lang][
                                         "plot_cases_new_regional_title"
-                                    ][lang].get(),
+                                    ],
                                 ),
                                 dcc.Graph(
                                     id="case-graph-diff",
@@ -1349,7 +1513,7 @@ def get_layout():
         )
 
     # Regional Log-Log Development Plot
-    if cfg["show"]["log_log_regional_development"]:
+    if cfg.show.log_log_regional_development and "regional_data" not in data.pending:
         content.extend(
             [
                 html.Div(id="caseincrease-regional-data", style={"display": "none"}),
@@ -1359,15 +1523,11 @@ def get_layout():
                             [
                                 html.Div(
                                     className="plot-title",
-                                    children=cfg["i18n"]["plot_loglog_region_title"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["plot_loglog_region_title"],
                                 ),
                                 html.Div(
                                     className="info-container",
-                                    children=cfg["i18n"]["info_log_log_regional"][
-                                        lang
-                                    ].get(),
+                                    children=cfg.i18n[lang]["info_log_log_regional"],
                                 ),
                                 dcc.Graph(
                                     id="caseincrease-regional-graph",
@@ -1382,9 +1542,9 @@ def get_layout():
                     children=[
                         html.P(
                             className="slider-text",
-                            children=cfg["i18n"]["drag_the_slider_to_change_the_date"][
-                                lang
-                            ].get(),
+                            children=cfg.i18n[lang][
+                                "drag_the_slider_to_change_the_date"
+                            ],
                         ),
                         dcc.Slider(
                             id="slider-date-regional",
@@ -1405,28 +1565,112 @@ def get_layout():
         )
 
     # Raw Data
-    if cfg["show"]["raw"]:
+    if cfg.show.raw:
         content.extend(
             [
                 html.H4(
-                    children=cfg["i18n"]["raw_data_title"][lang].get(),
+                    children=cfg.i18n[lang]["raw_data_title"],
                     style={"color": style.theme["accent"]},
                 ),
                 html.P(
                     id="source-paragraph",
-                    children=[
-                        dcc.Markdown(cfg["i18n"]["raw_data_content"][lang].get())
-                    ],
+                    children=[dcc.Markdown(cfg.i18n[lang]["raw_data_content"])],
                 ),
             ]
         )
 
-    return dbc.Container(id="main", children=content, fluid=True)
+    layout = dbc.Container(id="main", children=content, fluid=True)
+
+    # The figures of the graphs in the layout that are switched between the
+    # scales and regions in the browser are sent along with it
+    graph_ids = []
+    for component in layout._traverse():
+        graph_id = getattr(component, "id", None)
+        if graph_id in static_figures and graph_id not in graph_ids:
+            graph_ids.append(graph_id)
+
+    if graph_ids:
+        content.append(
+            dcc.Store(
+                id="static-figures", data=build_static_figures(lang, data, graph_ids)
+            )
+        )
+
+    return layout
+
+
+def get_layout():
+    return build_layout(get_lang(), data_store.get())
 
 
 app.layout = get_layout
 
 
+# The layout only depends on the language and the data generation. It is built
+# and serialized for all the languages once per generation. When a new
+# generation arrives, the layouts are rebuilt in the background while the
+# previous ones are still served. Without any data, they only show a notice
+# until the first generation arrives.
+class Layouts:
+    def __init__(self, data):
+        self.generation = data.generation if data is not None else None
+        self.json = {}
+        self.json_gzip = {}
+        self.hash = {}
+
+        for lang in range(len(cfg.settings.languages)):
+            layout = json.dumps(
+                build_layout(lang, data), cls=plotly.utils.PlotlyJSONEncoder
+            ).encode()
+            self.json[lang] = layout
+            self.json_gzip[lang] = gzip.compress(layout, mtime=0)
+            self.hash[lang] = hashlib.sha1(layout).hexdigest()[:16]
+
+
+layouts_lock = threading.Lock()
+layouts_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def update_layouts():
+    global layouts
+    try:
+        data = data_store.get()
+        if data is not None and data.generation != layouts.generation:
+            with METRICS.time("dashcoch_layout_build_duration_seconds"):
+                layouts = Layouts(data)
+    except Exception as e:
+        print("Building the layouts failed: " + repr(e))
+    finally:
+        layouts_lock.release()
+
+
+def serve_layout():
+    data = data_store.get()
+    if data is not None and data.generation != layouts.generation:
+        if layouts_lock.acquire(blocking=False):
+            layouts_executor.submit(update_layouts)
+
+    current = layouts
+    lang = get_lang()
+    if lang not in current.json:
+        lang = cfg.settings.default_language
+
+    if "gzip" in flask.request.accept_encodings:
+        response = flask.Response(current.json_gzip[lang], mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(current.hash[lang] + "-gzip")
+    else:
+        response = flask.Response(current.json[lang], mimetype="application/json")
+        response.set_etag(current.hash[lang])
+
+    response.headers["Vary"] = "Accept-Encoding, Accept-Language, Referer"
+    return response.make_conditional(flask.request)
+
+
+# Dash registered its own view for the layout route when the app was created
+server.view_functions[app.config.routes_pathname_prefix + "_dash-layout"] = serve_layout
+
+
 # -------------------------------------------------------------------------------
 # Callbacks
 # -------------------------------------------------------------------------------
@@ -1453,6 +1697,7 @@ try:
         [Input("slider-date", "value")],
     )
     def update_map_date(selected_date_index):
+        data = data_store.get()
 
         d = data.swiss_cases["Date"].iloc[selected_date_index]
         return d.strftime("%d. %m. %Y")
@@ -1467,18 +1712,14 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("case-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_case_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("case-ch-graph")
+    def update_case_ch_graph(lang, data):
         return {
             "data": [
                 {
                     "x": data.swiss_cases["Date"],
-                    "y": data.swiss_cases[cfg["settings"]["total_column_name"].get()],
-                    "name": cfg["settings"]["total_column_name"].get(),
+                    "y": data.swiss_cases[cfg.settings.total_column_name],
+                    "name": cfg.settings.total_column_name,
                     "mode": "lines",
                     "marker": {"color": style.theme["foreground"]},
                     "showlegend": False,
@@ -1489,18 +1730,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_total_reported_cases_country_x"][
-                        lang
-                    ].get(),
+                    "title": cfg.i18n[lang]["plot_total_reported_cases_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_total_reported_cases_country_y"][
-                        lang
-                    ].get(),
+                    "title": cfg.i18n[lang]["plot_total_reported_cases_country_y"],
                 },
                 "hovermode": "x unified",
                 "dragmode": False,
@@ -1529,7 +1766,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -1551,20 +1788,14 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("fatalities-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_fatalities_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("fatalities-ch-graph")
+    def update_fatalities_ch_graph(lang, data):
         return {
             "data": [
                 {
                     "x": data.swiss_fatalities["Date"],
-                    "y": data.swiss_fatalities[
-                        cfg["settings"]["total_column_name"].get()
-                    ],
-                    "name": cfg["settings"]["total_column_name"].get(),
+                    "y": data.swiss_fatalities[cfg.settings.total_column_name],
+                    "name": cfg.settings.total_column_name,
                     "mode": "lines",
                     "marker": {"color": style.theme["foreground"]},
                     "showlegend": False,
@@ -1575,14 +1806,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_total_fatalities_country_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_total_fatalities_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_total_fatalities_country_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_total_fatalities_country_y"],
                 },
                 "hovermode": "x unified",
                 "dragmode": False,
@@ -1611,7 +1842,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -1633,13 +1864,9 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("new-case-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_new_case_ch_graph(selected_scale):
-        lang = get_lang()
-        total_column_name = cfg["settings"]["total_column_name"].get()
+    @static_figure("new-case-ch-graph")
+    def update_new_case_ch_graph(lang, data):
+        total_column_name = cfg.settings.total_column_name
         return {
             "data": [
                 {
@@ -1653,7 +1880,7 @@ try:
                 {
                     "x": data.swiss_cases_by_date_diff.index,
                     "y": data.swiss_cases_by_date_diff[total_column_name + "_rolling"],
-                    "name": cfg["i18n"]["moving_average"][lang].get(),
+                    "name": cfg.i18n[lang]["moving_average"],
                     "mode": "lines",
                     "marker": {"color": style.theme["foreground"]},
                     "fill": "tozeroy",
@@ -1664,18 +1891,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_daily_reported_cases_country_x"][
-                        lang
-                    ].get(),
+                    "title": cfg.i18n[lang]["plot_daily_reported_cases_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_daily_reported_cases_country_y"][
-                        lang
-                    ].get(),
+                    "title": cfg.i18n[lang]["plot_daily_reported_cases_country_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -1715,7 +1938,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -1737,13 +1960,9 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("new-fatalities-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_new_fatalities_ch_graph(selected_scale):
-        lang = get_lang()
-        total_column_name = cfg["settings"]["total_column_name"].get()
+    @static_figure("new-fatalities-ch-graph")
+    def update_new_fatalities_ch_graph(lang, data):
+        total_column_name = cfg.settings.total_column_name
         return {
             "data": [
                 {
@@ -1759,7 +1978,7 @@ try:
                     "y": data.swiss_fatalities_by_date_diff[
                         total_column_name + "_rolling"
                     ],
-                    "name": cfg["i18n"]["moving_average"][lang].get(),
+                    "name": cfg.i18n[lang]["moving_average"],
                     "mode": "lines",
                     "marker": {"color": style.theme["foreground"]},
                     "fill": "tozeroy",
@@ -1770,14 +1989,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_daily_fatalities_country_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_daily_fatalities_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_daily_fatalities_country_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_daily_fatalities_country_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -1817,7 +2036,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -1839,34 +2058,28 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("hospitalizations-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_hospitalizations_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("hospitalizations-ch-graph")
+    def update_hospitalizations_ch_graph(lang, data):
         return {
             "data": [
                 {
                     "x": data.swiss_hospitalizations["Date"],
-                    "y": data.swiss_hospitalizations[
-                        cfg["settings"]["total_column_name"].get()
-                    ],
-                    "name": cfg["i18n"]["plot_hospitalizations_regular"][lang].get(),
+                    "y": data.swiss_hospitalizations[cfg.settings.total_column_name],
+                    "name": cfg.i18n[lang]["plot_hospitalizations_regular"],
                     "mode": "lines",
                     "marker": {"color": style.theme["yellow"]},
                 },
                 {
                     "x": data.swiss_icu["Date"],
-                    "y": data.swiss_icu[cfg["settings"]["total_column_name"].get()],
-                    "name": cfg["i18n"]["plot_hospitalizations_intensive"][lang].get(),
+                    "y": data.swiss_icu[cfg.settings.total_column_name],
+                    "name": cfg.i18n[lang]["plot_hospitalizations_intensive"],
                     "mode": "lines",
                     "marker": {"color": style.theme["red"]},
                 },
                 {
                     "x": data.swiss_vent["Date"],
-                    "y": data.swiss_vent[cfg["settings"]["total_column_name"].get()],
-                    "name": cfg["i18n"]["plot_hospitalizations_ventilated"][lang].get(),
+                    "y": data.swiss_vent[cfg.settings.total_column_name],
+                    "name": cfg.i18n[lang]["plot_hospitalizations_ventilated"],
                     "mode": "lines",
                     "marker": {"color": style.theme["blue"]},
                 },
@@ -1876,14 +2089,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_hospitalizations_country_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_hospitalizations_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_hospitalizations_country_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_hospitalizations_country_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -1921,7 +2134,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -1940,19 +2153,13 @@ except:
 
 try:
 
-    @app.callback(
-        Output("releases-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_releases_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("releases-ch-graph")
+    def update_releases_ch_graph(lang, data):
         return {
             "data": [
                 {
                     "x": data.swiss_releases["Date"],
-                    "y": data.swiss_releases[
-                        cfg["settings"]["total_column_name"].get()
-                    ],
+                    "y": data.swiss_releases[cfg.settings.total_column_name],
                     "name": "Regular",
                     "mode": "lines",
                     "marker": {"color": style.theme["foreground"]},
@@ -1964,14 +2171,14 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_releases_country_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_releases_country_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_releases_country_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_releases_country_y"],
                 },
                 "hovermode": "x unified",
                 "dragmode": False,
@@ -2000,7 +2207,7 @@ try:
                         "y": 0.95,
                         "xref": "x",
                         "yref": "paper",
-                        "text": cfg["i18n"]["incomplete_data"][lang].get(),
+                        "text": cfg.i18n[lang]["incomplete_data"],
                         "font": {"color": style.theme["accent"]},
                         "align": "left",
                         "showarrow": True,
@@ -2022,43 +2229,33 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("caseincrease-ch-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_caseincrease_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("caseincrease-ch-graph", axes=())
+    def update_caseincrease_ch_graph(lang, data):
         return {
             "data": [
                 {
-                    "x": data.swiss_cases.iloc[6:-2][
-                        cfg["settings"]["total_column_name"].get()
-                    ],
-                    "y": data.moving_total[cfg["settings"]["total_column_name"].get()][
-                        6:-2
-                    ],
+                    "x": data.swiss_cases.iloc[6:-2][cfg.settings.total_column_name],
+                    "y": data.moving_total[cfg.settings.total_column_name][6:-2],
                     "mode": "lines+markers",
-                    "name": cfg["i18n"]["plot_loglog_country_weekly"][lang].get(),
+                    "name": cfg.i18n[lang]["plot_loglog_country_weekly"],
                     "marker": {"color": style.theme["foreground"]},
                     "text": data.moving_total["date_label"][6:-2],
-                    "hovertemplate": cfg["i18n"][
+                    "hovertemplate": cfg.i18n[lang][
                         "plot_log_log_country_weekly_hovertemplate"
-                    ][lang].get(),
+                    ],
                 },
                 {
-                    "x": data.swiss_cases.iloc[6:-2][
-                        cfg["settings"]["total_column_name"].get()
+                    "x": data.swiss_cases.iloc[6:-2][cfg.settings.total_column_name],
+                    "y": data.swiss_cases_by_date_diff[cfg.settings.total_column_name][
+                        6:-2
                     ],
-                    "y": data.swiss_cases_by_date_diff[
-                        cfg["settings"]["total_column_name"].get()
-                    ][6:-2],
                     "mode": "lines+markers",
-                    "name": cfg["i18n"]["plot_loglog_country_daily"][lang].get(),
+                    "name": cfg.i18n[lang]["plot_loglog_country_daily"],
                     "marker": {"color": style.theme["yellow"]},
                     "text": data.swiss_cases_by_date_diff["date_label"][6:-2],
-                    "hovertemplate": cfg["i18n"][
+                    "hovertemplate": cfg.i18n[lang][
                         "plot_log_log_country_daily_hovertemplate"
-                    ][lang].get(),
+                    ],
                 },
             ],
             "layout": {
@@ -2066,7 +2263,7 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_loglog_country_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_loglog_country_x"],
                     "type": "log",
                 },
                 "yaxis": {
@@ -2074,7 +2271,7 @@ try:
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_loglog_country_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_loglog_country_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -2102,12 +2299,8 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("cases-world-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_cases_world_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("cases-world-graph")
+    def update_cases_world_graph(lang, data):
         return {
             "data": [
                 {
@@ -2125,13 +2318,13 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_cases_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_cases_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_cases_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_cases_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -2157,12 +2350,8 @@ except:
 
 try:
 
-    @app.callback(
-        Output("fatalities-world-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_fatalities_world_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("fatalities-world-graph")
+    def update_fatalities_world_graph(lang, data):
         return {
             "data": [
                 {
@@ -2180,13 +2369,13 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_fatalities_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_fatalities_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_fatalities_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_fatalities_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -2212,12 +2401,8 @@ except:
 
 try:
 
-    @app.callback(
-        Output("new-tests-world-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_tests_world_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("new-tests-world-graph")
+    def update_tests_world_graph(lang, data):
         return {
             "data": [
                 {
@@ -2235,13 +2420,13 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_tests_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_tests_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_tests_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_tests_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -2268,12 +2453,8 @@ except:
 
 try:
 
-    @app.callback(
-        Output("test-positivity-world-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_test_positivity_world_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("test-positivity-world-graph")
+    def update_test_positivity_world_graph(lang, data):
         return {
             "data": [
                 {
@@ -2292,13 +2473,13 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_positivity_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_positivity_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_world_positivity_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_world_positivity_y"],
                 },
                 "legend": {
                     "x": 0.015,
@@ -2325,12 +2506,8 @@ except:
 
 try:
 
-    @app.callback(
-        Output("tests-vs-positivity-world-graph", "figure"),
-        [Input("radio-scale-switzerland", "value")],
-    )
-    def update_caseincrease_ch_graph(selected_scale):
-        lang = get_lang()
+    @static_figure("tests-vs-positivity-world-graph", axes=("xaxis", "yaxis"))
+    def update_tests_vs_positivity_world_graph(lang, data):
         return {
             "data": [
                 {
@@ -2345,9 +2522,9 @@ try:
                         "width": 1.0,
                     },
                     "showlegend": False,
-                    "hovertemplate": cfg["i18n"][
+                    "hovertemplate": cfg.i18n[lang][
                         "plot_tests_vs_positivity_hovertemplate"
-                    ][lang].get(),
+                    ],
                 }
                 for country in data.world_no_na
             ]
@@ -2365,9 +2542,9 @@ try:
                         "color": "white",
                     },
                     "showlegend": False,
-                    "hovertemplate": cfg["i18n"][
+                    "hovertemplate": cfg.i18n[lang][
                         "plot_tests_vs_positivity_hovertemplate"
-                    ][lang].get(),
+                    ],
                     "textposition": "top center",
                 }
                 for country in data.world_no_na
@@ -2377,15 +2554,15 @@ try:
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_tests_vs_positivity_x"][lang].get(),
-                    "type": selected_scale,
+                    "title": cfg.i18n[lang]["plot_tests_vs_positivity_x"],
+                    "type": "linear",
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
                     "rangemode": "tozero",
-                    "title": cfg["i18n"]["plot_tests_vs_positivity_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_tests_vs_positivity_y"],
                 },
                 "hovermode": "closest",
                 "dragmode": False,
@@ -2411,9 +2588,9 @@ except:
 #     )
 #     def updated_cases_bag_title(norm):
 #         if norm == "scaled":
-#             return cfg["i18n"]["plot_age_dist_scaled_title"][lang].get()
+#             return cfg.i18n[lang]["plot_age_dist_scaled_title"]
 #         else:
-#             return cfg["i18n"]["plot_age_dist_abs_title"][lang].get()
+#             return cfg.i18n[lang]["plot_age_dist_abs_title"]
 
 #     @app.callback(
 #         Output("cases-bag-graph", "figure"),
@@ -2423,12 +2600,12 @@ except:
 #         lang = get_lang()
 #         field = "cases"
 #         factor = 1
-#         ytitle = cfg["i18n"]["plot_age_dist_abs_y"][lang].get()
+#         ytitle = cfg.i18n[lang]["plot_age_dist_abs_y"]
 
 #         if norm == "scaled":
 #             field = "cases_pp"
 #             factor = 100
-#             ytitle = cfg["i18n"]["plot_age_dist_scaled_y"][lang].get()
+#             ytitle = cfg.i18n[lang]["plot_age_dist_scaled_y"]
 
 #         return {
 #             "data": [
@@ -2440,7 +2617,7 @@ except:
 #                         data.age_data_male_hist["region"] == region
 #                     ][field]
 #                     * factor,
-#                     "name": cfg["i18n"]["male"][lang].get(),
+#                     "name": cfg.i18n[lang]["male"],
 #                     # "mode": "lines",
 #                     "type": "bar",
 #                     "line": {"width": 2.0, "color": "rgba(255, 5, 71, 1)",},
@@ -2454,7 +2631,7 @@ except:
 #                         data.age_data_female_hist["region"] == region
 #                     ][field]
 #                     * factor,
-#                     "name": cfg["i18n"]["female"][lang].get(),
+#                     "name": cfg.i18n[lang]["female"],
 #                     # "mode": "lines",
 #                     "type": "bar",
 #                     "line": {"width": 2.0, "color": "rgba(56, 206, 255, 1)",},
@@ -2466,7 +2643,7 @@ except:
 #                 "xaxis": {
 #                     "showgrid": True,
 #                     "color": "#ffffff",
-#                     "title": cfg["i18n"]["plot_age_dist_x"][lang].get(),
+#                     "title": cfg.i18n[lang]["plot_age_dist_x"],
 #                 },
 #                 "yaxis": {
 #                     "type": "linear",
@@ -2506,9 +2683,9 @@ except:
 #     )
 #     def updated_cases_bag_title(norm):
 #         if norm == "scaled":
-#             return cfg["i18n"]["plot_age_dist_fatalities_scaled_title"][lang].get()
+#             return cfg.i18n[lang]["plot_age_dist_fatalities_scaled_title"]
 #         else:
-#             return cfg["i18n"]["plot_age_dist_fatalities_abs_title"][lang].get()
+#             return cfg.i18n[lang]["plot_age_dist_fatalities_abs_title"]
 
 #     @app.callback(
 #         Output("fatalities-bag-graph", "figure"),
@@ -2518,12 +2695,12 @@ except:
 #         lang = get_lang()
 #         field = "fatalities"
 #         factor = 1
-#         ytitle = cfg["i18n"]["plot_age_dist_fatalities_abs_y"][lang].get()
+#         ytitle = cfg.i18n[lang]["plot_age_dist_fatalities_abs_y"]
 
 #         if norm == "scaled":
 #             field = "fatalities_pp"
 #             factor = 100
-#             ytitle = cfg["i18n"]["plot_age_dist_fatalities_scaled_y"][lang].get()
+#             ytitle = cfg.i18n[lang]["plot_age_dist_fatalities_scaled_y"]
 
 #         return {
 #             "data": [
@@ -2535,7 +2712,7 @@ except:
 #                         data.age_data_male_hist["region"] == region
 #                     ][field]
 #                     * factor,
-#                     "name": cfg["i18n"]["male"][lang].get(),
+#                     "name": cfg.i18n[lang]["male"],
 #                     # "mode": "lines",
 #                     "type": "bar",
 #                     "line": {"width": 2.0, "color": "rgba(255, 5, 71, 1)",},
@@ -2549,7 +2726,7 @@ except:
 #                         data.age_data_female_hist["region"] == region
 #                     ][field]
 #                     * factor,
-#                     "name": cfg["i18n"]["female"][lang].get(),
+#                     "name": cfg.i18n[lang]["female"],
 #                     # "mode": "lines",
 #                     "type": "bar",
 #                     "line": {"width": 2.0, "color": "rgba(56, 206, 255, 1)",},
@@ -2561,7 +2738,7 @@ except:
 #                 "xaxis": {
 #                     "showgrid": True,
 #                     "color": "#ffffff",
-#                     "title": cfg["i18n"]["plot_age_dist_fatalities_x"][lang].get(),
+#                     "title": cfg.i18n[lang]["plot_age_dist_fatalities_x"],
 #                 },
 #                 "yaxis": {
 #                     "type": "linear",
@@ -2597,34 +2774,28 @@ try:
 
     @app.callback(
         Output("region-boxes", "figure"),
-        [Input("dropdown-regions", "value"), Input("radio-scale-regions", "value")],
+        [Input("dropdown-regions", "value")],
     )
-    def update_region_boxes(selected_regions, selected_scale):
+    @figure_cache.memoize()
+    def update_region_boxes(selected_regions):
         lang = get_lang()
-        d = data.swiss_cases_by_date_diff
-        d_selected = (
-            d[selected_regions]
-            / data.swiss_cases_updated_mask_by_date[selected_regions]
-        )
+        data = data_store.get()
+        region_order = data.region_boxes_totals[selected_regions].sort_values().index
+        rows = data.region_boxes_totals.index.get_indexer(region_order)
 
-        region_order = (
-            d_selected.transpose().sum(axis=1).sort_values().transpose().index
-        )
-
-        d_selected = d_selected[region_order]
-        values = d_selected.values.transpose()
+        values = data.region_boxes[rows]
+        customdata = values.astype(object)
+        customdata[data.region_boxes_missing[rows]] = cfg.i18n[lang][
+            "plot_regional_null"
+        ]
 
         return {
             "data": [
                 {
-                    "x": d.index,
-                    "y": list(d_selected.columns),
+                    "x": data.swiss_cases_by_date_diff.index,
+                    "y": list(region_order),
                     "z": values,
-                    "customdata": d_selected.replace(
-                        np.nan,
-                        cfg["i18n"]["plot_regional_null"][lang].get(),
-                        regex=True,
-                    ).values.transpose(),
+                    "customdata": customdata,
                     "colorscale": "Portland",
                     "hovertemplate": "<br><span style='font-size:2.0em'><b>%{customdata}</b></span><b> %{y}</b><br>%{x}<extra></extra>",
                     "type": "heatmap",
@@ -2634,11 +2805,11 @@ try:
                 "height": 500,
                 "xaxis": {
                     "showgrid": False,
-                    "title": cfg["i18n"]["plot_regional_overview_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_regional_overview_x"],
                 },
                 "yaxis": {
                     "showgrid": False,
-                    "title": cfg["i18n"]["plot_regional_overview_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_regional_overview_y"],
                     "fixedrange": True,
                 },
                 # "hovermode": "x unified",
@@ -2661,12 +2832,8 @@ except:
 #
 try:
 
-    @app.callback(
-        Output("case-graph", "figure"),
-        [Input("dropdown-regions", "value"), Input("radio-scale-regions", "value")],
-    )
-    def update_case_graph(selected_regions, selected_scale):
-        lang = get_lang()
+    @static_figure("case-graph", scale_input="radio-scale-regions", regions="data")
+    def update_case_graph(lang, data):
         return {
             "data": [
                 {
@@ -2676,20 +2843,20 @@ try:
                     "marker": {"color": style.region_colors[region]},
                 }
                 for _, region in enumerate(data.swiss_cases_as_dict)
-                if region in selected_regions
+                if region in data.region_labels
             ],
             "layout": {
                 "height": 750,
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_regional_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_regional_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_regional_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_regional_y"],
                 },
                 "dragmode": False,
                 "hovermode": "x unified",
@@ -2706,12 +2873,8 @@ except:
 
 try:
 
-    @app.callback(
-        Output("case-pc-graph", "figure"),
-        [Input("dropdown-regions", "value"), Input("radio-scale-regions", "value")],
-    )
-    def update_case_pc_graph(selected_regions, selected_scale):
-        lang = get_lang()
+    @static_figure("case-pc-graph", scale_input="radio-scale-regions", regions="data")
+    def update_case_pc_graph(lang, data):
         return {
             "data": [
                 {
@@ -2721,20 +2884,20 @@ try:
                     "marker": {"color": style.region_colors[region]},
                 }
                 for _, region in enumerate(data.swiss_cases_normalized_as_dict)
-                if region in selected_regions
+                if region in data.region_labels
             ],
             "layout": {
                 "height": 750,
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_pc_regional_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_pc_regional_x"],
                 },
                 "yaxis": {
-                    "type": selected_scale,
+                    "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_pc_regional_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_pc_regional_y"],
                 },
                 "dragmode": False,
                 "hovermode": "x unified",
@@ -2751,12 +2914,13 @@ except:
 
 try:
 
-    @app.callback(
-        Output("case-graph-diff", "figure"),
-        [Input("dropdown-regions", "value"), Input("radio-scale-regions", "value")],
+    @static_figure(
+        "case-graph-diff",
+        scale_input="radio-scale-regions",
+        regions="selection",
+        axes=(),
     )
-    def update_case_graph_diff(selected_regions, selected_scale):
-        lang = get_lang()
+    def update_case_graph_diff(lang, data):
 
         return {
             "data": [
@@ -2767,20 +2931,20 @@ try:
                     "marker": {"color": style.region_colors[region]},
                     "type": "bar",
                 }
-                for region in selected_regions
+                for region in data.region_labels
             ],
             "layout": {
                 "height": 750,
                 "xaxis": {
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_new_regional_x"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_new_regional_x"],
                 },
                 "yaxis": {
                     "type": "linear",
                     "showgrid": True,
                     "color": "#ffffff",
-                    "title": cfg["i18n"]["plot_cases_new_regional_y"][lang].get(),
+                    "title": cfg.i18n[lang]["plot_cases_new_regional_y"],
                     "fixedrange": True,
                 },
                 "hovermode": "x unified",
@@ -2826,13 +2990,13 @@ except:
 #                 "xaxis": {
 #                     "showgrid": True,
 #                     "color": "#ffffff",
-#                     "title": cfg["i18n"]["plot_cases_new_regional_x"][lang].get(),
+#                     "title": cfg.i18n[lang]["plot_cases_new_regional_x"],
 #                 },
 #                 "yaxis": {
 #                     "type": "linear",
 #                     "showgrid": True,
 #                     "color": "#ffffff",
-#                     "title": cfg["i18n"]["plot_cases_new_regional_y"][lang].get(),
+#                     "title": cfg.i18n[lang]["plot_cases_new_regional_y"],
 #                 },
 #                 "polar": {
 #                     "angularaxis": {"rotation": 90, "direction": "clockwise"},
@@ -2863,80 +3027,12 @@ try:
             Input("map-radios", "value"),
             Input("slider-date", "value"),
             Input("map-data", "children"),
+            Input("map-data-loaded", "n_clicks"),
         ],
     )
 except:
     pass
 
-try:
-
-    @app.callback(Output("map-data", "children"), [Input("url", "pathname")])
-    def store_map_data(value):
-        settings = {
-            "total_column_name": cfg["settings"]["total_column_name"].get(),
-            "choropleth": {
-                "geojson_file": cfg["settings"]["choropleth"]["geojson_file"].get(),
-                "feature": cfg["settings"]["choropleth"]["feature"].get(),
-                "center": cfg["settings"]["choropleth"]["center"].get(),
-                "lataxis": cfg["settings"]["choropleth"]["lataxis"].get(),
-                "lonaxis": cfg["settings"]["choropleth"]["lonaxis"].get(),
-            },
-        }
-
-        theme = {"background": cfg["theme"]["background"].get()}
-
-        return (
-            '{"swiss_cases": '
-            + data.swiss_cases.to_json(date_format="iso", orient="columns")
-            + ', "swiss_cases_by_date_filled": '
-            + data.swiss_cases_by_date_filled.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_cases_by_date_filled_per_capita": '
-            + data.swiss_cases_by_date_filled_per_capita.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_fatalities_by_date_filled": '
-            + data.swiss_fatalities_by_date_filled.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_cases_by_date_diff": '
-            + data.swiss_cases_by_date_diff.to_json(date_format="iso", orient="columns")
-            + ', "swiss_fatalities_by_date_diff": '
-            + data.swiss_fatalities_by_date_diff.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_hospitalizations_by_date_diff": '
-            + data.swiss_hospitalizations_by_date_diff.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_hospitalizations_by_date_filled": '
-            + data.swiss_hospitalizations_by_date_filled.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "swiss_cases_updated_mask_by_date": '
-            + data.swiss_cases_updated_mask_by_date.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "regional_centres": '
-            + json.dumps(data.regional_centres)
-            + ', "settings": '
-            + json.dumps(settings)
-            + ', "theme":'
-            + json.dumps(theme)
-            + ', "turbo":'
-            + json.dumps(style.turbo)
-            + ', "region_labels":'
-            + json.dumps(data.region_labels)
-            + ', "region_updates":'
-            + json.dumps(data.last_updated["Updated_Today"].to_dict())
-            + "}"
-        )
-
-
-except:
-    pass
-
 #
 # Regional log-log graph (client-based)
 #
@@ -2965,35 +3061,147 @@ try:
     )
     def store_caseincrease_regional_data(value):
         lang = get_lang()
-        return (
-            '{"swiss_cases_by_date_filled": '
-            + data.swiss_cases_by_date_filled.to_json(
-                date_format="iso", orient="columns"
-            )
-            + ', "moving_total":'
-            + data.moving_total.to_json(date_format="iso", orient="columns")
-            + ', "i18n": {'
-            + '"plot_loglog_region_title": "'
-            + cfg["i18n"]["plot_loglog_region_title"][lang].get()
-            + '",'
-            + '"plot_loglog_region_x": "'
-            + cfg["i18n"]["plot_loglog_region_x"][lang].get()
-            + '",'
-            + '"plot_loglog_region_y": "'
-            + cfg["i18n"]["plot_loglog_region_y"][lang].get()
-            + '",'
-            + '"plot_log_log_region_weekly_hovertemplate": "'
-            + cfg["i18n"]["plot_log_log_region_weekly_hovertemplate"][lang].get()
-            + '"}}'
-        )
+        data = data_store.get()
+        i18n = {
+            key: cfg.i18n[lang][key]
+            for key in [
+                "plot_loglog_region_title",
+                "plot_loglog_region_x",
+                "plot_loglog_region_y",
+                "plot_log_log_region_weekly_hovertemplate",
+            ]
+        }
+        return '{"data": ' + data.regional_data + ', "i18n": ' + json.dumps(i18n) + "}"
 
 
 except:
     pass
 
-# Kick off the updated thread
-executor = ThreadPoolExecutor(max_workers=1)
-executor.submit(update_data)
+#
+# Static figures (client-side)
+#
+for graph_id, static in static_figures.items():
+    try:
+        if static["regions"] is None:
+            app.clientside_callback(
+                ClientsideFunction(
+                    namespace="clientside", function_name="update_static_figure"
+                ),
+                Output(graph_id, "figure"),
+                [
+                    Input(static["scale_input"], "value"),
+                    Input("static-figures", "data"),
+                ],
+                [State(graph_id, "id")],
+            )
+        else:
+            app.clientside_callback(
+                ClientsideFunction(
+                    namespace="clientside", function_name="update_regional_figure"
+                ),
+                Output(graph_id, "figure"),
+                [
+                    Input("dropdown-regions", "value"),
+                    Input(static["scale_input"], "value"),
+                    Input("static-figures", "data"),
+                ],
+                [State(graph_id, "id")],
+            )
+    except:
+        pass
+
+
+# The static figures are registered now, so the layouts can be built
+layouts = Layouts(data_store.get())
+
+# Every callback is timed and its exceptions (other than PreventUpdate) and
+# response sizes are recorded. Dash calls them through the callback map with
+# the serialized response as the result.
+def instrument_callback(f):
+    labels = {"callback": f.__name__}
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        try:
+            with METRICS.time("dashcoch_callback_duration_seconds", labels):
+                response = f(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            METRICS.inc("dashcoch_callback_exceptions_total", labels)
+            raise
+
+        METRICS.observe("dashcoch_callback_response_bytes", len(response), labels)
+        return response
+
+    return wrapper
+
+
+# Clientside callbacks are in the map as well, without a function
+for callback in app.callback_map.values():
+    if "callback" in callback:
+        callback["callback"] = instrument_callback(callback["callback"])
+
+
+@server.route("/metrics")
+def metrics():
+    data = data_store.get()
+    status = data_store.get_status()
+
+    gauges = [
+        (
+            "dashcoch_source_age_seconds",
+            "Seconds since the last successful download of the sources",
+            [
+                ({"source": name}, source["age"])
+                for name, source in status["sources"].items()
+                if source["age"] is not None
+            ],
+        ),
+        (
+            "dashcoch_source_failures",
+            "Consecutive failed downloads of the sources",
+            [
+                ({"source": name}, source["failures"])
+                for name, source in status["sources"].items()
+            ],
+        ),
+        (
+            "dashcoch_layout_bytes",
+            "Size of the served layouts (gzip compressed)",
+            [
+                ({"lang": cfg.settings.languages[lang]}, len(layout))
+                for lang, layout in layouts.json_gzip.items()
+            ],
+        ),
+    ]
+
+    if data is not None:
+        gauges.append(
+            (
+                "dashcoch_data_generation",
+                "Data generation served",
+                [({}, data.generation)],
+            )
+        )
+        if hasattr(data, "map_data"):
+            gauges.append(
+                (
+                    "dashcoch_map_data_bytes",
+                    "Size of the map data",
+                    [
+                        ({"encoding": "identity"}, len(data.map_data)),
+                        ({"encoding": "gzip"}, len(data.map_data_gzip)),
+                    ],
+                )
+            )
+
+    return flask.Response(METRICS.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+# Start refreshing the data, unless it is loaded by a separate process
+if data_store.directory is None:
+    scheduler.start()
 
 if __name__ == "__main__":
     app.run_server(
@@ -2,44 +2,151 @@ if (!window.dash_clientside) {
   window.dash_clientside = {};
 }
 
+// The data for the clientside graphs comes in a columnar format: the values of
+// all frames are packed into one base64 encoded float32 buffer, which is
+// decoded once and every column is a view into it. Missing values are NaN.
+function decode_columnar(data_raw) {
+  var bytes = atob(data_raw.values);
+  var buffer = new Uint8Array(bytes.length);
+  for (var i = 0; i < bytes.length; i++)
+    buffer[i] = bytes.charCodeAt(i);
+
+  var values = new Float32Array(buffer.buffer);
+  var length = data_raw.index.length;
+  var data = {};
+
+  for (var n in data_raw.frames) {
+    var frame = data_raw.frames[n];
+    data[n] = {};
+    frame.columns.forEach((column, i) => {
+      var offset = frame.offset + i * length;
+      data[n][column] = values.subarray(offset, offset + length);
+    });
+  }
+
+  return data;
+}
+
+// Like Math.max, but skipping the missing values
+function max_value(values) {
+  var max = 0;
+  for (var i = 0; i < values.length; i++)
+    if (values[i] > max)
+      max = values[i];
+  return max;
+}
+
+// The map data is fetched once per URL (the URL changes with the data) and
+// kept together with its arrays, so moving the slider does not decode it
+// again. The request does not block the page: until the data is there, null
+// is returned and the map is left as it is. Once it has arrived, the hidden
+// map-data-loaded button is clicked, which calls update_map again.
+var map_data_cache = {};
+
+function load_map_data(url) {
+  if (map_data_cache.url === url)
+    return map_data_cache.data ? map_data_cache : null;
+
+  map_data_cache = {url: url};
+  fetch(url)
+    .then(response => {
+      if (!response.ok)
+        throw new Error(response.status + " " + response.statusText);
+      return response.json();
+    })
+    .then(data_raw => {
+      if (map_data_cache.url !== url)
+        return;
+
+      var data = decode_columnar(data_raw);
+      data.regional_centres = data_raw.regional_centres;
+      map_data_cache = {url: url, data_raw: data_raw, data: data};
+
+      var loaded = document.getElementById("map-data-loaded");
+      if (loaded)
+        loaded.click();
+    })
+    .catch(error => {
+      // The next call tries again
+      if (map_data_cache.url === url)
+        map_data_cache = {};
+      console.error("Loading the map data failed: " + error);
+    });
+
+  return null;
+}
+
+// Same for the data of the regional log-log graph, which only changes with the
+// content of its div
+var regional_data_cache = {};
+
+function load_regional_data(div_data) {
+  if (regional_data_cache.div_data === div_data)
+    return regional_data_cache;
+
+  var data_raw = JSON.parse(div_data);
+  var data = decode_columnar(data_raw.data);
+  data.moving_total.date_label = data_raw.data.date_labels;
+
+  regional_data_cache = {div_data: div_data, data_raw: data_raw, data: data};
+  return regional_data_cache;
+}
+
+// The static figures come with the layout, built with all the regions and the
+// linear scale. The layout is copied, as plotly writes the computed ranges
+// into it. The traces are passed on as they are, so for a scale toggle plotly
+// finds the same data and only applies the changed axis types.
+function static_figure(stored, selected_scale, traces) {
+  // Nothing changes for a figure without scaled axes (the context is empty on
+  // the initial call)
+  var triggered = window.dash_clientside.callback_context.triggered;
+  if (
+    stored.axes.length === 0 &&
+    triggered.length > 0 &&
+    triggered.every(input => input.prop_id === stored.scale_input + ".value")
+  )
+    return window.dash_clientside.no_update;
+
+  var layout = JSON.parse(JSON.stringify(stored.figure.layout));
+  stored.axes.forEach(axis => {
+    layout[axis].type = selected_scale;
+  });
+
+  return {data: traces, layout: layout};
+}
+
 window.dash_clientside.clientside = {
-  update_map: function(mode, slider_date_index, div_data) {
-    data_raw = JSON.parse(div_data);
-
-    var data = {
-      swiss_cases: {},
-      swiss_cases_by_date_filled: {},
-      swiss_cases_by_date_filled_per_capita: {},
-      swiss_fatalities_by_date_filled: {},
-      regional_centres: {},
-      swiss_cases_by_date_diff: {},
-      swiss_fatalities_by_date_diff: {},
-      swiss_hospitalizations_by_date_diff: {},
-      swiss_hospitalizations_by_date_filled: {},
-      swiss_cases_updated_mask_by_date: {}
-    };
-
-    for (var n in data) {
-      for (var key in data_raw[n]) {
-        if (data_raw[n].hasOwnProperty(key)) {
-          values = []
-          for (var subkey in data_raw[n][key]) {
-            if (data_raw[n][key].hasOwnProperty(subkey)) {
-              values.push(data_raw[n][key][subkey])
-            }
-          }
-          data[n][key] = values
-        }
-      }
-    }
-    
+  update_static_figure: function(selected_scale, static_figures, graph_id) {
+    var stored = static_figures[graph_id];
+    return static_figure(stored, selected_scale, stored.figure.data);
+  },
+  update_regional_figure: function(selected_regions, selected_scale, static_figures, graph_id) {
+    var stored = static_figures[graph_id];
+    var selected = selected_regions || [];
+    var traces = stored.figure.data.filter(trace => selected.indexOf(trace.name) >= 0);
+
+    if (stored.regions === "selection")
+      traces = selected
+        .map(region => traces.find(trace => trace.name === region))
+        .filter(trace => trace !== undefined);
+
+    return static_figure(stored, selected_scale, traces);
+  },
+  update_map: function(mode, slider_date_index, map_data_url, loaded_clicks) {
+    var loaded = load_map_data(map_data_url);
+    if (loaded === null)
+      return window.dash_clientside.no_update;
+
+    var data_raw = loaded.data_raw;
+    var data = loaded.data;
+
     var d = slider_date_index;
     var map_data = data["swiss_cases_by_date_filled"];
     var labels = [];
     var mask = data["swiss_cases_updated_mask_by_date"];
 
     for (var region in data.regional_centres)
-      if (region !== null)
+      if (!isNaN(map_data[region][d]))
         labels.push(region + ": " + Math.round(map_data[region][d]).toString());
       else
         labels.push("");
@@ -48,7 +155,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_cases_by_date_filled_per_capita"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null)
+        if (!isNaN(map_data[region][d]))
           labels.push(region + ": " + (Math.round(map_data[region][d] * 100) / 100).toString());
         else
           labels.push("");
@@ -56,7 +163,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_fatalities_by_date_filled"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null)
+        if (!isNaN(map_data[region][d]))
           labels.push(region + ": " + Math.round(map_data[region][d]).toString());
         else
           labels.push("");
@@ -64,7 +171,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_cases_by_date_diff"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null && mask[region][d])
+        if (!isNaN(map_data[region][d]) && mask[region][d])
           labels.push(region + ": " + Math.round(map_data[region][d]).toString());
         else
           labels.push("");
@@ -72,7 +179,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_fatalities_by_date_diff"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null)
+        if (!isNaN(map_data[region][d]))
           labels.push(region + ": " + Math.round(map_data[region][d]).toString());
         else
           labels.push("");
@@ -80,7 +187,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_hospitalizations_by_date_diff"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null)
+        if (!isNaN(map_data[region][d]))
           labels.push(region + ": " + Math.round(map_data[region][d]).toString());
         else
           labels.push("");
@@ -88,7 +195,7 @@ window.dash_clientside.clientside = {
       labels = [];
       map_data = data["swiss_hospitalizations_by_date_filled"];
       for (var region in data.regional_centres)
-        if (map_data[region][d] !== null)
+        if (!isNaN(map_data[region][d]))
           labels.push(region + ": " + Math.round(map_data[region][d]).toString());
         else
           labels.push("");
@@ -160,40 +267,23 @@ window.dash_clientside.clientside = {
 
     var d = selected_date_index
 
-    data_raw = JSON.parse(div_data);
-
-    var data = {
-      swiss_cases_by_date_filled: {},
-      moving_total: []
-    };
-
-    for (var n in data) {
-      for (var key in data_raw[n]) {
-        if (data_raw[n].hasOwnProperty(key)) {
-          values = []
-          for (var subkey in data_raw[n][key]) {
-            if (data_raw[n][key].hasOwnProperty(subkey)) {
-              values.push(data_raw[n][key][subkey])
-            }
-          }
-          data[n][key] = values
-        }
-      }
-    }
+    var loaded = load_regional_data(div_data);
+    var data_raw = loaded.data_raw;
+    var data = loaded.data;
 
     var x_max = 0
     var y_max = 0
 
     selected_cantons.forEach(canton => {
-      x_max = Math.max(x_max, Math.max(...data["swiss_cases_by_date_filled"][canton]))
-      y_max = Math.max(y_max, Math.max(...data["moving_total"][canton]))
+      x_max = Math.max(x_max, max_value(data["swiss_cases_by_date_filled"][canton]))
+      y_max = Math.max(y_max, max_value(data["moving_total"][canton]))
     })
 
     traces = []
     selected_cantons.forEach(canton => {
       traces.push({
-        x: data["swiss_cases_by_date_filled"][canton].slice(6, d),
-        y: data["moving_total"][canton].slice(6, d),
+        x: Array.from(data["swiss_cases_by_date_filled"][canton].slice(6, d)),
+        y: Array.from(data["moving_total"][canton].slice(6, d)),
         mode: "lines",
         name: canton,
         marker: {
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashcoch.config import freeze
+
+# Import time of the dashcoch package and boot time of the app in dev mode
+# (python app.py), before and after importing scipy lazily and restoring the
+# snapshot of the last run. Before, scipy.stats was imported along with the
+# DataLoader, which the import before dashcoch stands in for. Every import is
+# timed in a fresh process and the best of REPEAT is reported.
+#
+# The boots load the sources of the active configuration (DASHCOCHDIR) into a
+# temporary cache, snapshot and data directory, starting with an empty cache
+# each time. The time from starting the process until the first layout with
+# data is served and until the complete layout is served is reported, first
+# without a snapshot and then with the one saved by the first boot.
+#
+#   python benchmarks/boot.py
+
+REPEAT = 5
+IMPORTS = {
+    "before": "from scipy import stats; import dashcoch",
+    "after": "import dashcoch",
+}
+
+
+def time_import(statement):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Run in the booting process, prints the seconds since started
+def boot(started):
+    import app
+
+    client = app.server.test_client()
+    route = app.app.config.routes_pathname_prefix + "_dash-layout"
+    first = None
+    while True:
+        data = app.data_store.get()
+        client.get(route)
+        if data is not None and app.layouts.generation == data.generation:
+            if first is None:
+                first = time.time() - started
+            if not data.pending:
+                print(json.dumps([first, time.time() - started]))
+                return
+        time.sleep(0.01)
+
+
+def time_boot(directory):
+    shutil.rmtree(os.path.join(directory, "cache"), ignore_errors=True)
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, __file__, "--boot", str(started)],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+        env=dict(os.environ, DASHCOCHDIR=directory),
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    for variant, statement in IMPORTS.items():
+        seconds = time_import(statement)
+        print("import " + variant + ": " + str(round(seconds, 2)) + " s")
+
+    cfg = freeze()
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "config.yaml"), "w") as f:
+            json.dump(
+                {
+                    "urls": dict(cfg.urls),
+                    "settings": {
+                        "cache": os.path.join(directory, "cache"),
+                        "data_store": os.path.join(directory, "data"),
+                        "snapshot": os.path.join(directory, "snapshot.pickle"),
+                    },
+                },
+                f,
+            )
+
+        for variant in ("without a snapshot", "with a snapshot"):
+            first, complete = time_boot(directory)
+            print(
+                "boot "
+                + variant
+                + ": first layout "
+                + str(round(first, 2))
+                + " s, complete "
+                + str(round(complete, 2))
+                + " s"
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--boot"]:
+        boot(float(sys.argv[2]))
+    else:
+        main()
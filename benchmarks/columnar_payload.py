@@ -0,0 +1,131 @@
+import os
+import sys
+import gzip
+import json
+import base64
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashcoch.columnar import to_columnar
+from dashcoch.data_loader import COLS
+
+# Size and decode time of the frames of the clientside map, before and after
+# sending them in the columnar format. The synthetic frames have the columns
+# of the regions over DAYS days, like the FRAMES of the map data, with some
+# days without data. The payloads are decoded into one array per column, the
+# way the browser does it: the date-keyed objects key by key, the columnar
+# buffer with one view per column. The best of REPEAT runs is reported.
+#
+#   python benchmarks/columnar_payload.py [days]
+
+DAYS = 240
+REPEAT = 5
+FRAMES = [
+    "swiss_cases_by_date_filled",
+    "swiss_cases_by_date_filled_per_capita",
+    "swiss_fatalities_by_date_filled",
+    "swiss_cases_by_date_diff",
+    "swiss_fatalities_by_date_diff",
+    "swiss_hospitalizations_by_date_diff",
+    "swiss_hospitalizations_by_date_filled",
+    "swiss_cases_updated_mask_by_date",
+]
+
+
+def make_frames(days):
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2020-02-25", periods=days, name="Date")
+
+    frames = {}
+    for name in FRAMES:
+        values = np.cumsum(rng.integers(0, 50, (days, len(COLS) - 1)), axis=0)
+        frame = pd.DataFrame(values.astype(float), index=index, columns=COLS[1:])
+        frame[rng.random(frame.shape) < 0.05] = np.nan
+        if name.endswith("_mask_by_date"):
+            frame = frame.notna()
+        frames[name] = frame
+    return frames, index
+
+
+# The payload as built before, one date-keyed object per column
+def encode_before(frames, index):
+    return (
+        "{"
+        + ", ".join(
+            json.dumps(name) + ": " + frame.to_json(date_format="iso", orient="columns")
+            for name, frame in frames.items()
+        )
+        + "}"
+    )
+
+
+def encode_after(frames, index):
+    return json.dumps(to_columnar(frames, index))
+
+
+def decode_before(payload):
+    data = json.loads(payload)
+    return {
+        name: {
+            column: [values[date] for date in sorted(values)]
+            for column, values in frame.items()
+        }
+        for name, frame in data.items()
+    }
+
+
+def decode_after(payload):
+    data = json.loads(payload)
+    values = np.frombuffer(base64.b64decode(data["values"]), dtype="<f4")
+    length = len(data["index"])
+    return {
+        name: {
+            column: values[
+                frame["offset"] + i * length : frame["offset"] + (i + 1) * length
+            ]
+            for i, column in enumerate(frame["columns"])
+        }
+        for name, frame in data["frames"].items()
+    }
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else DAYS
+    frames, index = make_frames(days)
+    print(str(len(frames)) + " frames, " + str(days) + " days")
+
+    # Both give the same values, as float32
+    before = decode_before(encode_before(frames, index))
+    after = decode_after(encode_after(frames, index))
+    for name in frames:
+        for column in frames[name]:
+            np.testing.assert_array_equal(
+                np.array(before[name][column], dtype=float).astype("<f4"),
+                after[name][column],
+            )
+
+    for variant, encode, decode in (
+        ("before", encode_before, decode_before),
+        ("after", encode_after, decode_after),
+    ):
+        payload = encode(frames, index)
+        size = len(payload.encode())
+        compressed = len(gzip.compress(payload.encode()))
+        seconds = min(timeit.repeat(lambda: decode(payload), number=1, repeat=REPEAT))
+        print(
+            variant
+            + ": "
+            + str(round(size / 1024))
+            + " kB ("
+            + str(round(compressed / 1024))
+            + " kB gzip), decoded in "
+            + str(round(seconds * 1000, 1))
+            + " ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashcoch.config import config, freeze
+
+# Time of a lookup in the configuration, before and after resolving it once
+# into a FrozenConfig. Before, every lookup went through the confuse views,
+# like cfg["i18n"]["title"][lang].get(). The configuration is the active one
+# (DASHCOCHDIR). Each lookup is repeated NUMBER times and the best of REPEAT
+# runs is reported, along with the time of freeze() itself.
+#
+#   python benchmarks/config_lookup.py
+
+NUMBER = 10000
+REPEAT = 5
+
+LOOKUPS = {
+    "i18n": (
+        lambda cfg, lang: cfg["i18n"]["title"][lang].get(),
+        lambda cfg, lang: cfg.i18n[lang]["title"],
+    ),
+    "setting": (
+        lambda cfg, lang: cfg["settings"]["total_column_name"].get(),
+        lambda cfg, lang: cfg.settings.total_column_name,
+    ),
+    "theme": (
+        lambda cfg, lang: cfg["theme"]["background"].get(),
+        lambda cfg, lang: cfg.theme.background,
+    ),
+}
+
+
+def best(f):
+    return min(timeit.repeat(f, number=NUMBER, repeat=REPEAT)) / NUMBER
+
+
+def main():
+    frozen = freeze()
+    lang = 1
+
+    for name, (before, after) in LOOKUPS.items():
+        # Both give the same value
+        assert before(config, lang) == after(frozen, lang)
+
+        before_seconds = best(lambda: before(config, lang))
+        after_seconds = best(lambda: after(frozen, lang))
+        print(
+            name
+            + ": before "
+            + str(round(before_seconds * 1e6, 2))
+            + " us, after "
+            + str(round(after_seconds * 1e6, 2))
+            + " us"
+        )
+
+    seconds = min(timeit.repeat(freeze, number=1, repeat=REPEAT))
+    print("freeze(): " + str(round(seconds * 1000, 1)) + " ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import gzip
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+# Time per request of /_dash-layout, before and after serving the layouts
+# prebuilt per data generation. Before, every request built the layout and
+# serialized it, which Dash's own view (app.serve_layout) still does. The app
+# loads the data of the active configuration, set DASHCOCHDIR to one with
+# local sources to leave the network out. Once the complete data is loaded,
+# REQUESTS requests per language are sent with the Flask test client and the
+# mean time per request is reported.
+#
+#   python benchmarks/layout_latency.py [requests]
+
+REQUESTS = 50
+ROUTE = app.app.config.routes_pathname_prefix + "_dash-layout"
+
+
+def wait_for_data(timeout=600):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        data = app.data_store.get()
+        if data is not None and not data.pending:
+            return data
+        time.sleep(0.1)
+    raise TimeoutError("The data was not loaded")
+
+
+def body(response):
+    if response.headers.get("Content-Encoding") == "gzip":
+        return gzip.decompress(response.data)
+    return response.data
+
+
+def get_layouts(client, view, requests):
+    app.server.view_functions[ROUTE] = view
+
+    responses = {}
+    start = time.perf_counter()
+    for _ in range(requests):
+        for lang in app.cfg.settings.languages:
+            response = client.get(
+                ROUTE, headers={"Accept-Language": lang, "Accept-Encoding": "gzip"}
+            )
+            assert response.status_code == 200
+            responses[lang] = response
+    seconds = time.perf_counter() - start
+
+    return responses, seconds / (requests * len(app.cfg.settings.languages))
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    data = wait_for_data()
+    app.layouts = app.Layouts(data)
+    client = app.server.test_client()
+
+    before, before_seconds = get_layouts(client, app.app.serve_layout, requests)
+    after, after_seconds = get_layouts(client, app.serve_layout, requests)
+
+    # Both give the same layouts
+    for lang in before:
+        assert body(before[lang]) == body(after[lang])
+
+    print("before: " + str(round(before_seconds * 1000, 1)) + " ms per request")
+    print("after: " + str(round(after_seconds * 1000, 1)) + " ms per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+
+# Page loads and requests per second, and their 99th percentile latency,
+# under load. gunicorn is started with WORKERS gevent workers on the data of
+# the active configuration (set DASHCOCHDIR to one with local sources). Once
+# the complete data is loaded, every client loads the page over and over for
+# the given number of seconds: the layout and then every server callback
+# Dash fires on load, with the values of their inputs from the layout, all
+# with gzip. Run it on a checkout of an earlier commit to compare.
+#
+#   python benchmarks/page_load.py [clients] [seconds]
+
+CLIENTS = 8
+SECONDS = 20
+WORKERS = 2
+BIND = "127.0.0.1:8811"
+URL = "http://" + BIND
+
+
+def request(path, body=None):
+    start = time.perf_counter()
+    response = urllib.request.urlopen(
+        urllib.request.Request(
+            URL + path,
+            data=body,
+            headers={"Content-Type": "application/json", "Accept-Encoding": "gzip"},
+        )
+    )
+    size = len(response.read())
+    return time.perf_counter() - start, size
+
+
+def wait_for_data(timeout=600):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        try:
+            ready = json.load(urllib.request.urlopen(URL + "/ready", timeout=1))
+            if ready["complete"]:
+                return
+        except urllib.error.HTTPError as e:
+            # Without /ready, the app only answers once it has the data
+            if e.code == 404:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("The data was not loaded")
+
+
+def get_props(node, props):
+    # The properties of the components in a serialized layout, by id
+    if isinstance(node, list):
+        for child in node:
+            get_props(child, props)
+    elif isinstance(node, dict):
+        if "props" in node and "id" in node["props"]:
+            props[node["props"]["id"]] = node["props"]
+        for child in node.values():
+            get_props(child, props)
+    return props
+
+
+# The requests of the server callbacks Dash fires when the page is loaded,
+# the ones with their output and all their inputs in the layout
+def get_callbacks():
+    props = get_props(json.load(urllib.request.urlopen(URL + "/_dash-layout")), {})
+    dependencies = json.load(urllib.request.urlopen(URL + "/_dash-dependencies"))
+
+    def values(items):
+        return [
+            dict(item, value=props[item["id"]].get(item["property"])) for item in items
+        ]
+
+    bodies = []
+    for callback in dependencies:
+        if callback.get("clientside_function"):
+            continue
+        if callback["output"].split(".")[0] not in props or any(
+            item["id"] not in props for item in callback["inputs"] + callback["state"]
+        ):
+            continue
+
+        bodies.append(
+            json.dumps(
+                {
+                    "output": callback["output"],
+                    "inputs": values(callback["inputs"]),
+                    "state": values(callback["state"]),
+                    "changedPropIds": [],
+                }
+            ).encode()
+        )
+    return bodies
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def load(bodies, clients, seconds):
+    requests = []
+    pages = []
+    sizes = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            page = [request("/_dash-layout")]
+            for body in bodies:
+                page.append(request("/_dash-update-component", body))
+
+            with lock:
+                pages.append(time.perf_counter() - start)
+                requests.extend(duration for duration, _ in page)
+                sizes.append(sum(size for _, size in page))
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(str(1 + len(bodies)) + " requests per page")
+    print(
+        str(round(len(pages) / seconds, 1))
+        + " pages/s, page p99 "
+        + str(round(percentile(pages, 0.99) * 1000))
+        + " ms, "
+        + str(round(sum(sizes) / len(sizes) / 1000))
+        + " kB per page"
+    )
+    print(
+        str(round(len(requests) / seconds, 1))
+        + " requests/s, request p99 "
+        + str(round(percentile(requests, 0.99) * 1000))
+        + " ms"
+    )
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+
+    with open(os.devnull, "w") as log:
+        gunicorn = subprocess.Popen(
+            ["gunicorn", "app:server", "-c", "gunicorn.conf.py"]
+            + ["-w", str(WORKERS), "-b", BIND],
+            cwd=os.path.join(os.path.dirname(__file__), ".."),
+            stdout=log,
+            stderr=log,
+        )
+        try:
+            wait_for_data()
+            load(get_callbacks(), clients, seconds)
+        finally:
+            gunicorn.terminate()
+            gunicorn.wait()
+
+
+if __name__ == "__main__":
+    main()
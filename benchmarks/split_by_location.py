@@ -0,0 +1,104 @@
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashcoch.data_loader import DataLoader
+
+# Time of splitting the world data into per-country frames, before and after
+# cutting it into slices in one pass. The synthetic frame has the
+# columns of the world data after the totals are derived, with the locations
+# as a categorical like __read_world reads them, ROWS rows over LOCATIONS
+# locations and some rows without test data. The best of REPEAT
+# runs is reported.
+#
+#   python benchmarks/split_by_location.py [locations] [rows]
+
+LOCATIONS = 210
+ROWS = 131000
+REPEAT = 5
+
+
+def make_world(locations, rows):
+    rng = np.random.default_rng(0)
+    days = rows // locations
+    names = ["Country " + str(i) for i in range(locations)]
+    dates = pd.date_range("2020-05-31", periods=days)
+
+    world = pd.DataFrame(
+        {
+            "location": pd.Categorical(np.repeat(names, days), categories=names),
+            "date": np.tile(dates.strftime("%Y-%m-%d"), locations),
+        }
+    )
+    for column in [
+        "new_cases",
+        "new_deaths",
+        "new_tests",
+        "new_tests_smoothed",
+        "positive_rate",
+        "population",
+        "total_cases",
+        "total_deaths",
+        "total_tests",
+        "total_cases_per_ten_thousand",
+        "total_deaths_per_ten_thousand",
+        "cfr",
+        "new_tests_smoothed_per_ten_thousand",
+    ]:
+        world[column] = rng.random(len(world)) * 1000
+    missing = rng.random(len(world)) < 0.3
+    world.loc[missing, "positive_rate"] = np.nan
+    world["date_label"] = pd.to_datetime(world["date"]).dt.strftime("%d. %m.")
+    return world
+
+
+# The per-country frames as built before, masking the whole frame twice per
+# country
+def split_before(world):
+    tmp = {}
+    world_no_na = {}
+    for country in world["location"].unique():
+        tmp[country] = world[world["location"] == country].copy()
+        world_no_na[country] = (
+            world[world["location"] == country]
+            .copy()
+            .dropna(subset=["new_tests_smoothed_per_ten_thousand", "positive_rate"])
+        )
+    return tmp, world_no_na
+
+
+def split_after(world):
+    split = DataLoader._DataLoader__split_by_location
+    world_no_na = world.dropna(
+        subset=["new_tests_smoothed_per_ten_thousand", "positive_rate"]
+    )
+    countries = world["location"].unique().tolist()
+    return (
+        split(None, world, countries),
+        split(None, world_no_na, countries),
+    )
+
+
+def main():
+    locations = int(sys.argv[1]) if len(sys.argv) > 1 else LOCATIONS
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else ROWS
+    world = make_world(locations, rows)
+    print(str(len(world)) + " rows, " + str(locations) + " locations")
+
+    # Both give the same frames
+    for before, after in zip(split_before(world), split_after(world)):
+        assert list(before) == list(after)
+        for country in before:
+            pd.testing.assert_frame_equal(before[country], after[country])
+
+    for variant, split in (("before", split_before), ("after", split_after)):
+        seconds = min(timeit.repeat(lambda: split(world), number=1, repeat=REPEAT))
+        print(variant + ": " + str(round(seconds, 3)) + " s")
+
+
+if __name__ == "__main__":
+    main()
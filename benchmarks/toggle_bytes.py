@@ -0,0 +1,120 @@
+import os
+import sys
+import gzip
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+# Requests and bytes sent per toggle of the scales. For every scale input, the
+# server callbacks listening to it are called with the Flask test client the
+# way the browser calls them after a toggle, with the values of the other
+# inputs taken from the layout. Clientside callbacks only run in the browser
+# and send nothing. The app loads the data of the active configuration, set
+# DASHCOCHDIR to one with local sources. Run it on a checkout of an earlier
+# commit to compare.
+#
+#   python benchmarks/toggle_bytes.py
+
+TOGGLES = {
+    "radio-scale-switzerland": ("linear", "log"),
+    "radio-scale-regions": ("linear", "log"),
+}
+ROUTE = app.app.config.routes_pathname_prefix + "_dash-update-component"
+
+
+def wait_for_data(timeout=600):
+    data_store = getattr(app, "data_store", None)
+    if data_store is None:
+        return
+
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        data = data_store.get()
+        if data is not None and not data.pending:
+            return
+        time.sleep(0.1)
+    raise TimeoutError("The data was not loaded")
+
+
+def get_props():
+    # The initial values of the properties of the components in the layout
+    with app.server.test_request_context("/"):
+        layout = app.app._layout_value()
+
+    props = {}
+    for component in layout._traverse():
+        for name in component._prop_names:
+            if hasattr(component, "id") and hasattr(component, name):
+                props[(component.id, name)] = getattr(component, name)
+    return props
+
+
+def values(dependencies, props, changed):
+    return [
+        {
+            "id": dependency["id"],
+            "property": dependency["property"],
+            "value": changed.get(
+                dependency["id"], props.get((dependency["id"], dependency["property"]))
+            ),
+        }
+        for dependency in dependencies
+    ]
+
+
+def main():
+    wait_for_data()
+    props = get_props()
+    client = app.server.test_client()
+
+    for toggle, scales in TOGGLES.items():
+        requests = 0
+        sent = 0
+        sent_gzip = 0
+        clientside = 0
+
+        for output, callback in app.app.callback_map.items():
+            if toggle not in [dependency["id"] for dependency in callback["inputs"]]:
+                continue
+            if "callback" not in callback:
+                clientside += 1
+                continue
+
+            for scale in scales:
+                response = client.post(
+                    ROUTE,
+                    json={
+                        "output": output,
+                        "inputs": values(callback["inputs"], props, {toggle: scale}),
+                        "state": values(callback["state"], props, {}),
+                        "changedPropIds": [toggle + ".value"],
+                    },
+                    headers={"Accept-Encoding": "gzip"},
+                )
+                assert response.status_code in (200, 204)
+                body = response.data
+                if response.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+
+                requests += 1
+                sent += len(body)
+                sent_gzip += len(response.data)
+
+        print(
+            toggle
+            + ": "
+            + str(requests // len(scales))
+            + " requests, "
+            + str(round(sent / len(scales) / 1000, 1))
+            + " kB ("
+            + str(round(sent_gzip / len(scales) / 1000, 1))
+            + " kB gzip) per toggle, "
+            + str(clientside)
+            + " clientside callbacks"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import resource
+import tempfile
+import subprocess
+from types import SimpleNamespace
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dashcoch.config import freeze
+from dashcoch.data_loader import DataLoader
+
+# Peak memory of reading the OWID world data, before and after streaming it in
+# chunks with only the used columns. The synthetic world file
+# repeats the Austrian rows of test.csv, shifted over about 600 days, for one
+# configured country and LOCATIONS - 1 other locations. Each variant reads it
+# in a fresh process, and the growth of the peak RSS while reading is
+# reported.
+#
+#   python benchmarks/world_memory.py [locations]
+
+LOCATIONS = 210
+TEST_CSV = os.path.join(os.path.dirname(__file__), "..", "test.csv")
+
+
+def write_world(path, locations):
+    rows = pd.read_csv(TEST_CSV, index_col=0)
+    rows = rows[rows["location"] == "Austria"].reset_index(drop=True)
+    dates = pd.to_datetime(rows["date"]) - pd.Timedelta(days=150)
+
+    frames = []
+    for i in range(locations):
+        for k in range(8):
+            frame = rows.copy()
+            frame["location"] = "Austria" if i == 0 else "Country " + str(i)
+            frame["date"] = (dates + pd.Timedelta(days=78 * k)).dt.strftime("%Y-%m-%d")
+            frames.append(frame)
+    pd.concat(frames, ignore_index=True).to_csv(path)
+
+
+# The world frame as read before, the whole file and then filtered
+def read_before(path):
+    countries = [*freeze().countries]
+    world = pd.read_csv(path)
+    return world[(world["location"].isin(countries)) & (world["date"] >= "2020-05-31")]
+
+
+def read_after(path):
+    loader = SimpleNamespace(cfg=freeze(), _DataLoader__source=lambda name: path)
+    return DataLoader._DataLoader__read_world(loader)
+
+
+def run(variant, path):
+    read = {"before": read_before, "after": read_after}[variant]
+    # Peak RSS in kB on Linux, the imports above are already part of it
+    start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    world = read(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(variant, len(world), (peak - start) / 1024)
+
+
+def main():
+    locations = int(sys.argv[1]) if len(sys.argv) > 1 else LOCATIONS
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "owid-covid-data.csv")
+        # Written by another process, a child forked from a large parent starts
+        # with the peak RSS of its parent
+        subprocess.run(
+            [sys.executable, __file__, "--write", path, str(locations)], check=True
+        )
+        print(
+            "World file: "
+            + str(locations)
+            + " locations, "
+            + str(round(os.path.getsize(path) / 2 ** 20))
+            + " MB"
+        )
+
+        for variant in ("before", "after"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--run", variant, path],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.split()
+            print(
+                variant
+                + ": "
+                + output[1]
+                + " rows, peak RSS growth "
+                + str(round(float(output[2])))
+                + " MB"
+            )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--write"]:
+        write_world(sys.argv[2], int(sys.argv[3]))
+    elif sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], sys.argv[3])
+    else:
+        main()
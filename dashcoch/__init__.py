@@ -1,2 +1,5 @@
 from .data_loader import DataLoader
 from .style_loader import StyleLoader
+from .data_store import DataStore
+from .figure_cache import FigureCache
+from .scheduler import Scheduler
@@ -0,0 +1,30 @@
+import base64
+import numpy as np
+import pandas as pd
+
+
+# Compact format for sending frames to the clientside callbacks. All frames
+# share one date index and the values of all their numeric columns are packed
+# into a single base64 encoded little-endian float32 buffer, column after
+# column. Missing values are NaN. The browser decodes the buffer once and
+# takes each column as a subarray of one Float32Array.
+def to_columnar(frames: dict, index: pd.DatetimeIndex):
+    layout = {}
+    values = []
+    offset = 0
+
+    for name, frame in frames.items():
+        frame = frame.select_dtypes(include=["number", "bool"])
+        frame = frame.set_axis(pd.to_datetime(frame.index), axis=0).reindex(index)
+
+        layout[name] = {"columns": list(frame.columns), "offset": offset}
+        values.append(frame.to_numpy(dtype="<f4").T.ravel())
+        offset += int(frame.size)
+
+    buffer = np.concatenate(values) if values else np.empty(0, dtype="<f4")
+
+    return {
+        "index": list(index.strftime("%Y-%m-%d")),
+        "frames": layout,
+        "values": base64.b64encode(buffer.tobytes()).decode("ascii"),
+    }
@@ -1,3 +1,64 @@
+import json
+import hashlib
 import confuse
 
 config = confuse.LazyConfig("dashcoch", __name__)
+
+
+# A resolved, read-only copy of the configuration. Looking a value up through
+# the confuse views walks all the configuration sources on every call, which
+# adds up in the callbacks. Values are reachable as attributes or items
+# (cfg.settings.total_column_name or cfg["countries"]["Austria"]) and lists
+# are tuples. The i18n texts are indexed by language first, so
+# cfg.i18n[lang]["title"] is the title in the language with the index lang.
+class FrozenConfig(dict):
+    def __init__(self, values: dict):
+        super().__init__((key, _freeze(value)) for key, value in values.items())
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("The configuration is read-only")
+
+    __setattr__ = __readonly
+    __setitem__ = __readonly
+    __delitem__ = __readonly
+    clear = __readonly
+    pop = __readonly
+    popitem = __readonly
+    setdefault = __readonly
+    update = __readonly
+
+    def __reduce__(self):
+        return FrozenConfig, (dict(self),)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenConfig(value)
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def freeze(view: confuse.ConfigView = config):
+    values = view.flatten()
+
+    i18n = values.pop("i18n", {})
+    values["i18n"] = [
+        {key: texts[lang] for key, texts in i18n.items() if lang < len(texts)}
+        for lang in range(len(values["settings"]["languages"]))
+    ]
+
+    return FrozenConfig(values)
+
+
+# A short hash of a resolved configuration. Processes and deployments with the
+# same configuration get the same one, also after a restart.
+def digest(cfg: FrozenConfig) -> str:
+    serialized = json.dumps(cfg, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode()).hexdigest()[:16]
@@ -1,10 +1,17 @@
 import math
+import time
+import gzip
+import json
+import uuid
+import hashlib
+from concurrent.futures import Future
 from datetime import date, datetime, timedelta
-import confuse
 import numpy as np
 import pandas as pd
 from pytz import timezone
-from scipy import stats
+from .style_loader import StyleLoader
+from .columnar import to_columnar
+from .config import FrozenConfig
 
 COLS = [
     "ZH",
@@ -37,38 +44,213 @@ COLS = [
     "Date",
 ]
 
+# The columns used from the OWID world data. The daily counts are stored
+# exactly as float32, rates and populations (above 2^24) need float64
+WORLD_DTYPES = {
+    "date": str,
+    "new_cases": np.float32,
+    "new_deaths": np.float32,
+    "new_tests": np.float32,
+    "new_tests_smoothed": np.float32,
+    "positive_rate": np.float64,
+    "population": np.float64,
+}
+WORLD_CHUNK_SIZE = 50000
+
+# Pseudo source that changes whenever the date (in Switzerland) changes
+TODAY = "today"
+
+# The labels of all days of the year, indexed by month and day, and of the
+# weekdays, so labelling a frame is a lookup instead of formatting every date
+DATE_LABELS = np.array(
+    [["%02d. %02d." % (day, month) for day in range(32)] for month in range(13)],
+    dtype=object,
+)
+WEEKDAYS = np.array(["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"], dtype=object)
+
+
+def date_labels(dates: pd.DatetimeIndex):
+    return DATE_LABELS[dates.month, dates.day]
+
+
+def node(sources=(), requires=(), show=None, lazy=False):
+    # Marks a DataLoader method as a node of the processing graph. A node is
+    # recomputed when one of its sources changed or one of the nodes it
+    # requires was recomputed, otherwise its attributes are taken over from
+    # the previous snapshot. Nodes with a show flag are skipped when the
+    # section is switched off. Lazy nodes (and the ones requiring them) can be
+    # deferred, so a first snapshot with the core data is available earlier.
+    def decorator(f):
+        f.sources = sources
+        f.requires = requires
+        f.show = show
+        f.lazy = lazy
+        return f
+
+    return decorator
+
 
 class DataLoader:
-    def __init__(self, cfg: confuse.Configuration):
+    def __init__(
+        self,
+        cfg: FrozenConfig,
+        sources: dict = None,
+        generation: int = 0,
+        previous=None,
+        changed: set = None,
+        deferred: list = (),
+    ):
         self.cfg = cfg
+        self.generation = generation
+        # Identifies the content of the snapshot. Unlike the generation, it is
+        # unique across restarts and processes, so it can be used in keys
+        # shared with other processes.
+        self.snapshot_id = uuid.uuid4().hex
+        self.__sources = sources if sources is not None else {}
+
+        # Nodes deferred to a later snapshot and all the nodes not built for
+        # this one, including the failed ones without previous data
+        self.deferred = tuple(deferred)
+        pending = list(deferred)
+        # Errors of the failed nodes, they keep the data of the previous
+        # snapshot if it has some
+        self.failed = {}
+
+        self.total_column_name = cfg.settings.total_column_name
+
+        # Seconds spent on each of the nodes computed for this snapshot
+        self.timings = {}
+        self.__node_attributes = {}
+
+        recomputed = set()
+        for name, build in self.get_nodes(cfg).items():
+            if name in pending or any(
+                required in pending for required in build.requires
+            ):
+                if name not in pending:
+                    pending.append(name)
+                continue
+
+            if (
+                previous is None
+                or changed is None
+                or name not in previous.__node_attributes
+                or any(source in changed for source in build.sources)
+                or any(required in recomputed for required in build.requires)
+            ):
+                before = set(vars(self))
+                start = time.perf_counter()
+                try:
+                    build(self)
+                except Exception as e:
+                    print("Building " + name + " failed: " + repr(e))
+                    for attribute in set(vars(self)) - before:
+                        delattr(self, attribute)
+                    self.failed[name] = repr(e)
+                    if previous is None or name not in previous.__node_attributes:
+                        pending.append(name)
+                        continue
+                else:
+                    self.timings[name] = time.perf_counter() - start
+                    self.__node_attributes[name] = [
+                        attribute for attribute in vars(self) if attribute not in before
+                    ]
+                    recomputed.add(name)
+                    continue
+
+            # Unchanged, or failed with data in the previous snapshot
+            for attribute in previous.__node_attributes[name]:
+                setattr(self, attribute, getattr(previous, attribute))
+            self.__node_attributes[name] = previous.__node_attributes[name]
+            if name in previous.failed and name not in self.failed:
+                self.failed[name] = previous.failed[name]
+
+        self.pending = tuple(pending)
+
+        # Only needed while building, downloads cannot be pickled
+        del self.__sources
+
+        # Snapshots are shared between callbacks, no more changes from here on
+        self.__frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_DataLoader__frozen", False):
+            raise AttributeError("DataLoader snapshots are read-only")
+        super().__setattr__(name, value)
+
+    @staticmethod
+    def get_nodes(cfg: FrozenConfig):
+        # The nodes of the enabled sections, in the order they are defined
+        return {
+            f.__name__.lstrip("_"): f
+            for f in vars(DataLoader).values()
+            if hasattr(f, "requires") and (f.show is None or cfg.show[f.show])
+        }
 
-        self.total_column_name = cfg["settings"]["total_column_name"].get()
-
-        #
-        # Load info on the latest updates
-        #
-        if cfg["show"]["updates"]:
-            self.last_updated = pd.read_csv(
-                cfg["urls"]["last_updated"].get(), index_col=[0]
-            ).sort_values(by=["Date", "Time"], ascending=False)
-
-            self.last_updated["Date"] = pd.to_datetime(self.last_updated["Date"])
-            self.last_updated = self.__get_iso(self.last_updated)
-
-        # Load the data from the regions
-        self.swiss_cases = pd.read_csv(cfg["urls"]["cases"].get(), usecols=COLS)
-        self.swiss_fatalities = pd.read_csv(
-            cfg["urls"]["fatalities"].get(), usecols=COLS
-        )
+    @staticmethod
+    def get_deferred(cfg: FrozenConfig, previous=None):
+        # The lazy nodes missing in the previous snapshot and everything that
+        # requires them
+        deferred = []
+        for name, build in DataLoader.get_nodes(cfg).items():
+            if (
+                build.lazy
+                and (previous is None or name not in previous.__node_attributes)
+            ) or any(required in deferred for required in build.requires):
+                deferred.append(name)
+        return deferred
+
+    @staticmethod
+    def get_sources(cfg: FrozenConfig, deferred: list = ()):
+        sources = []
+        for name, build in DataLoader.get_nodes(cfg).items():
+            if name in deferred:
+                continue
+            for source in build.sources:
+                if source != TODAY and source not in sources:
+                    sources.append(source)
+        return sources
+
+    def __source(self, name):
+        # Files fetched by the DataStore, the URL otherwise. Sources still
+        # being downloaded are waited for.
+        if name in self.__sources:
+            source = self.__sources[name]
+            if isinstance(source, Future):
+                source = source.result()
+            return source
+        return self.cfg.urls[name]
+
+    def __getstate__(self):
+        # The configuration is not pickled, the DataStore loading a snapshot
+        # puts its own one back
+        state = vars(self).copy()
+        del state["cfg"]
+        return state
+
+    #
+    # Load info on the latest updates
+    #
+    @node(sources=("last_updated", TODAY), show="updates")
+    def __updates(self):
+        self.last_updated = pd.read_csv(
+            self.__source("last_updated"), index_col=[0]
+        ).sort_values(by=["Date", "Time"], ascending=False)
+
+        self.last_updated["Date"] = pd.to_datetime(self.last_updated["Date"])
+        self.last_updated = self.__get_iso(self.last_updated)
+
+    #
+    # Load the data from the regions
+    #
+    @node(sources=("cases", "fatalities"))
+    def __swiss(self):
+        self.swiss_cases = pd.read_csv(self.__source("cases"), usecols=COLS)
+        self.swiss_fatalities = pd.read_csv(self.__source("fatalities"), usecols=COLS)
 
         self.swiss_cases["Date"] = pd.to_datetime(self.swiss_cases["Date"])
         self.swiss_fatalities["Date"] = pd.to_datetime(self.swiss_fatalities["Date"])
 
-        # Get Swiss demographical data
-        self.regional_demography = pd.read_csv(
-            cfg["urls"]["demography"].get(), index_col=0
-        )
-
         self.swiss_cases_by_date = self.swiss_cases.set_index("Date")
         self.swiss_fatalities_by_date = self.swiss_fatalities.set_index("Date")
         self.swiss_cases_updated_mask_by_date = ~self.swiss_cases_by_date.isnull()
@@ -77,6 +259,63 @@ class DataLoader:
             method="ffill", axis=0
         )
 
+        self.swiss_fatalities_by_date_filled = self.swiss_fatalities_by_date.fillna(
+            method="ffill", axis=0
+        )
+
+        self.swiss_case_fatality_rates = (
+            self.swiss_fatalities_by_date_filled / self.swiss_cases_by_date_filled
+        )
+
+        self.latest_date = self.__get_latest_date()
+        self.updated_regions = self.__get_updated_regions()
+        self.total_swiss_cases = self.__get_total_swiss_cases()
+        self.total_swiss_fatalities = self.__get_total_swiss_fatalities()
+        self.swiss_case_fatality_rate = (
+            self.total_swiss_fatalities / self.total_swiss_cases
+        )
+
+        # Put the date at the end
+        self.swiss_cases_as_dict = self.swiss_cases.to_dict("list")
+        date_tmp = self.swiss_cases_as_dict.pop("Date")
+        self.swiss_cases_as_dict["Date"] = date_tmp
+
+        self.swiss_fatalities_as_dict = self.swiss_fatalities.to_dict("list")
+        self.region_labels = [
+            region
+            for region in self.swiss_cases_as_dict
+            if region != self.total_column_name and region != "Date"
+        ]
+
+    @node(requires=("swiss",), sources=(TODAY,))
+    def __new_swiss_cases(self):
+        self.new_swiss_cases = max(0, self.__get_new_cases())
+
+    @node()
+    def __regional_centres(self):
+        self.regional_centres = self.__get_regional_centres()
+
+    #
+    # Get Swiss demographical data
+    #
+    @node(sources=("demography",))
+    def __regional_demography(self):
+        self.regional_demography = pd.read_csv(self.__source("demography"), index_col=0)
+
+    @node(requires=("swiss", "regional_demography"))
+    def __swiss_per_capita(self):
+        self.swiss_cases_by_date_filled_per_capita = (
+            self.__get_swiss_cases_by_date_filled_per_capita()
+        )
+        self.swiss_cases_normalized_as_dict = (
+            self.__get_swiss_cases_as_normalized_dict()
+        )
+
+    #
+    # Daily differences
+    #
+    @node(requires=("swiss",))
+    def __swiss_diff(self):
         self.swiss_cases_by_date_diff = self.swiss_cases_by_date_filled.diff().replace()
 
         self.swiss_cases_by_date_diff[self.total_column_name + "_rolling"] = np.round(
@@ -91,30 +330,16 @@ class DataLoader:
             self.total_column_name + "_rolling",
         ] = np.nan
 
-        self.swiss_cases_by_date_diff["date_label"] = [
-            pd.to_datetime(str(d)).strftime("%d. %m.")
-            for d in self.swiss_cases_by_date_diff.index.values
-        ]
-
-        self.swiss_cases_by_date_diff["weekday_number"] = [
-            pd.to_datetime(str(d)).weekday()
-            for d in self.swiss_cases_by_date_diff.index.values
-        ]
-
-        weekdays = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
-        self.swiss_cases_by_date_diff["weekday"] = [
-            weekdays[w] for w in self.swiss_cases_by_date_diff["weekday_number"]
-        ]
-
-        week = 0
-        weeks = []
-        for d in self.swiss_cases_by_date_diff["weekday_number"].values:
-            weeks.append(week)
+        dates = self.swiss_cases_by_date_diff.index
+        weekday_number = dates.weekday.values
 
-            if d == 6:
-                week += 1
+        self.swiss_cases_by_date_diff["date_label"] = date_labels(dates)
+        self.swiss_cases_by_date_diff["weekday_number"] = weekday_number
+        self.swiss_cases_by_date_diff["weekday"] = WEEKDAYS[weekday_number]
 
-        self.swiss_cases_by_date_diff["week"] = weeks
+        # A new week starts after every sunday
+        sundays = weekday_number == 6
+        self.swiss_cases_by_date_diff["week"] = sundays.cumsum() - sundays
 
         self.swiss_fatalities_by_date_diff = (
             self.swiss_fatalities_by_date.diff().replace()
@@ -134,183 +359,218 @@ class DataLoader:
             self.total_column_name + "_rolling",
         ] = np.nan
 
-        self.swiss_cases_by_date_filled = self.swiss_cases_by_date.fillna(
-            method="ffill", axis=0
-        )
-
-        self.swiss_fatalities_by_date_filled = self.swiss_fatalities_by_date.fillna(
-            method="ffill", axis=0
-        )
+    #
+    # Moving average showing development
+    #
+    @node(requires=("swiss",))
+    def __moving_total(self):
+        self.moving_total = self.__get_moving_total(
+            self.swiss_cases_by_date.diff()
+        ).replace(0, float("nan"))
 
-        self.swiss_case_fatality_rates = (
-            self.swiss_fatalities_by_date_filled / self.swiss_cases_by_date_filled
+    #
+    # Hospitalization Data
+    #
+    @node(
+        sources=("hospitalizations", "icu", "vent"),
+        show="hospitalizations",
+        lazy=True,
+    )
+    def __hospitalizations(self):
+        self.swiss_hospitalizations = pd.read_csv(
+            self.__source("hospitalizations"), usecols=COLS
         )
-
-        self.swiss_cases_by_date_filled_per_capita = (
-            self.__get_swiss_cases_by_date_filled_per_capita()
+        self.swiss_icu = pd.read_csv(self.__source("icu"), usecols=COLS)
+        self.swiss_vent = pd.read_csv(self.__source("vent"), usecols=COLS)
+        self.swiss_hospitalizations_by_date = self.swiss_hospitalizations.set_index(
+            "Date"
         )
 
-        self.latest_date = self.__get_latest_date()
-        self.updated_regions = self.__get_updated_regions()
-        self.new_swiss_cases = max(0, self.__get_new_cases())
-        self.total_swiss_cases = self.__get_total_swiss_cases()
-        self.total_swiss_fatalities = self.__get_total_swiss_fatalities()
-        self.swiss_case_fatality_rate = (
-            self.total_swiss_fatalities / self.total_swiss_cases
+        self.swiss_hospitalizations_by_date_diff = (
+            self.swiss_hospitalizations_by_date.diff().replace(0, float("nan"))
         )
 
-        # Put the date at the end
-        self.swiss_cases_as_dict = self.swiss_cases.to_dict("list")
-        date_tmp = self.swiss_cases_as_dict.pop("Date")
-        self.swiss_cases_as_dict["Date"] = date_tmp
-        self.swiss_cases_normalized_as_dict = (
-            self.__get_swiss_cases_as_normalized_dict()
+        self.swiss_hospitalizations_by_date_filled = (
+            self.swiss_hospitalizations_by_date.fillna(method="ffill", axis=0)
         )
 
-        self.swiss_fatalities_as_dict = self.swiss_fatalities.to_dict("list")
-        self.region_labels = [
-            region
-            for region in self.swiss_cases_as_dict
-            if region != self.total_column_name and region != "Date"
+    @node(sources=("releases",), show="hospital_releases", lazy=True)
+    def __releases(self):
+        self.swiss_releases = pd.read_csv(self.__source("releases"))
+
+    #
+    # Get age distribution data
+    #
+    @node(sources=("age_distribution",), show="age_distribution", lazy=True)
+    def __age_distribution(self):
+        self.age_data = pd.read_csv(self.__source("age_distribution"))
+        self.age_data["region"] = self.age_data[
+            self.cfg.settings.age_distribution_region_column_name
         ]
-        self.regional_centres = self.__get_regional_centres()
-
-        #
-        # Moving average showing development
-        #
-        self.moving_total = self.__get_moving_total(
-            self.swiss_cases_by_date.diff()
-        ).replace(0, float("nan"))
 
-        #
-        # Hospitalization Data
-        #
-        if cfg["show"]["hospitalizations"]:
-            self.swiss_hospitalizations = pd.read_csv(
-                cfg["urls"]["hospitalizations"].get(), usecols=COLS
-            )
-            self.swiss_icu = pd.read_csv(cfg["urls"]["icu"].get(), usecols=COLS)
-            self.swiss_vent = pd.read_csv(cfg["urls"]["vent"].get(), usecols=COLS)
-            self.swiss_hospitalizations_by_date = self.swiss_hospitalizations.set_index(
-                "Date"
-            )
+        self.age_data_male_hist = self.age_data[self.age_data["sex"] == "Male"].replace(
+            0, np.nan
+        )
+        self.age_data_female_hist = self.age_data[
+            self.age_data["sex"] == "Female"
+        ].replace(0, np.nan)
+
+    #
+    # Get testing data
+    #
+    @node(sources=("tests",), show="tests", lazy=True)
+    def __tests(self):
+        self.tests = pd.read_csv(self.__source("tests"), index_col=[0])
+        self.tests = self.tests[self.tests.index >= self.cfg.settings.start_date]
+        self.tests["pos_rate"] = np.round(self.tests["pos_rate"] * 100, 2)
+
+        self.tests["pos_rate_rolling"] = (
+            self.tests["pos_rate"].rolling(7, center=True).mean()
+        )
 
-            self.swiss_hospitalizations_by_date_diff = (
-                self.swiss_hospitalizations_by_date.diff().replace(0, float("nan"))
+    #
+    # World related data
+    #
+    @node(sources=("world",), show="international", lazy=True)
+    def __world(self):
+        # self.world_cases = self.__simplify_world_data(
+        #     pd.read_csv(cfg.urls.world_cases)
+        # )
+
+        self.world = self.__read_world()
+
+        # Set new for last of May to zero, so all start at 0
+        self.world.loc[
+            self.world["date"] == "2020-05-31",
+            ["new_cases", "new_deaths", "new_tests"],
+        ] = 0
+
+        # Sum up in float64, the totals are too large for float32
+        locations = self.world["location"]
+        self.world["total_cases"] = (
+            self.world["new_cases"].astype(np.float64).groupby(locations).cumsum()
+        ).fillna(0)
+        self.world["total_deaths"] = (
+            self.world["new_deaths"].astype(np.float64).groupby(locations).cumsum()
+        ).fillna(0)
+        self.world["total_tests"] = (
+            self.world["new_tests"].astype(np.float64).groupby(locations).cumsum()
+        ).fillna(0)
+        self.world["total_cases_per_ten_thousand"] = (
+            self.world["total_cases"] / self.world["population"] * 10000
+        ).round(decimals=3)
+        self.world["total_deaths_per_ten_thousand"] = (
+            self.world["total_deaths"] / self.world["population"] * 10000
+        ).round(decimals=3)
+        self.world["cfr"] = (
+            self.world["total_deaths"] / self.world["total_cases"]
+        ).round(decimals=3)
+        self.world["new_tests_smoothed_per_ten_thousand"] = (
+            self.world["new_tests_smoothed"] / self.world["population"] * 10000
+        ).round(decimals=3)
+        self.world["date_label"] = pd.to_datetime(self.world["date"]).dt.strftime(
+            "%d. %m."
+        )
+        # Put in per-country dict to avoid doing this with every callback
+        world_no_na = self.world.dropna(
+            subset=["new_tests_smoothed_per_ten_thousand", "positive_rate"]
+        )
+        countries = self.world["location"].unique().tolist()
+        self.world_no_na = self.__split_by_location(world_no_na, countries)
+        self.world = self.__split_by_location(self.world, countries)
+
+    #
+    # Data for the clientside map, serialized once per generation
+    #
+    @node(
+        requires=(
+            "updates",
+            "swiss",
+            "swiss_per_capita",
+            "swiss_diff",
+            "hospitalizations",
+            "regional_centres",
+        ),
+        show="map",
+    )
+    def __map_data(self):
+        self.map_data = self.__get_map_data().encode()
+        self.map_data_gzip = gzip.compress(self.map_data, mtime=0)
+        self.map_data_hash = hashlib.sha1(self.map_data).hexdigest()[:16]
+
+    #
+    # Data for the clientside log-log graph of the regions
+    #
+    @node(requires=("swiss", "moving_total"), show="log_log_regional_development")
+    def __regional_data(self):
+        payload = to_columnar(
+            {
+                "swiss_cases_by_date_filled": self.swiss_cases_by_date_filled,
+                "moving_total": self.moving_total,
+            },
+            self.swiss_cases_by_date_filled.index,
+        )
+        payload["date_labels"] = self.moving_total["date_label"].tolist()
+        self.regional_data = json.dumps(payload)
+
+    #
+    # Regional overview heatmap, the callback only picks the selected rows
+    #
+    @node(requires=("swiss", "swiss_diff"), show="region_overview")
+    def __region_boxes(self):
+        # New cases of the days each region reported, one row per region
+        boxes = (
+            self.swiss_cases_by_date_diff[self.region_labels]
+            / self.swiss_cases_updated_mask_by_date[self.region_labels]
+        ).transpose()
+        self.region_boxes = boxes.to_numpy()
+        self.region_boxes_missing = np.isnan(self.region_boxes)
+        self.region_boxes_totals = boxes.sum(axis=1)
+
+    def __read_world(self):
+        # Read the (large) file in chunks and only keep the configured countries
+        # from the end of May on, so the whole file is never in memory at once.
+        # Unknown locations are not part of the categories and become NaN.
+        countries = pd.CategoricalDtype([*self.cfg.countries])
+        chunks = [
+            chunk[chunk["location"].notna() & (chunk["date"] >= "2020-05-31")]
+            for chunk in pd.read_csv(
+                self.__source("world"),
+                usecols=["location", *WORLD_DTYPES],
+                dtype={"location": countries, **WORLD_DTYPES},
+                chunksize=WORLD_CHUNK_SIZE,
             )
+        ]
+        return pd.concat(chunks, ignore_index=True)
 
-            self.swiss_hospitalizations_by_date_filled = (
-                self.swiss_hospitalizations_by_date.fillna(method="ffill", axis=0)
-            )
+    def __split_by_location(self, df, locations):
+        # Stable sort by location (keeping the dates in order) and cut the
+        # frame into one contiguous slice per location, instead of masking
+        # the whole frame for every single location
+        codes = pd.Categorical(df["location"], categories=locations).codes
+        order = np.argsort(codes, kind="stable")
+        df = df.iloc[order]
+        codes = codes[order]
 
-        if cfg["show"]["hospital_releases"]:
-            self.swiss_releases = pd.read_csv(cfg["urls"]["releases"].get())
-
-        #
-        # Get age distribution data
-        #
-        if cfg["show"]["age_distribution"]:
-            self.age_data = pd.read_csv(cfg["urls"]["age_distribution"].get())
-            self.age_data["region"] = self.age_data[
-                self.cfg["settings"]["age_distribution_region_column_name"].get()
-            ]
-
-            self.age_data_male_hist = self.age_data[
-                self.age_data["sex"] == "Male"
-            ].replace(0, np.nan)
-            self.age_data_female_hist = self.age_data[
-                self.age_data["sex"] == "Female"
-            ].replace(0, np.nan)
-
-        #
-        # Get testing data
-        #
-        if cfg["show"]["tests"]:
-            self.tests = pd.read_csv(cfg["urls"]["tests"].get(), index_col=[0])
-            self.tests = self.tests[
-                self.tests.index >= cfg["settings"]["start_date"].get()
-            ]
-            self.tests["pos_rate"] = np.round(self.tests["pos_rate"] * 100, 2)
-
-            self.tests["pos_rate_rolling"] = (
-                self.tests["pos_rate"].rolling(7, center=True).mean()
-            )
+        starts = np.searchsorted(codes, np.arange(len(locations)), side="left")
+        ends = np.searchsorted(codes, np.arange(len(locations)), side="right")
 
-        #
-        # World related data
-        #
-        if cfg["show"]["international"]:
-            # self.world_cases = self.__simplify_world_data(
-            #     pd.read_csv(cfg["urls"]["world_cases"].get())
-            # )
-
-            self.world = pd.read_csv(cfg["urls"]["world"].get())
-            self.world = self.world[
-                (self.world["location"].isin([*self.cfg["countries"].get()]))
-                & (self.world["date"] >= "2020-05-31")
-            ]
-
-            # Set new for last of May to zero, so all start at 0
-            self.world.loc[
-                self.world["date"] == "2020-05-31",
-                ["new_cases", "new_deaths", "new_tests"],
-            ] = 0
-
-            self.world["total_cases"] = (
-                self.world.groupby("location")["new_cases"].cumsum().fillna(0)
-            )
-            self.world["total_deaths"] = (
-                self.world.groupby("location")["new_deaths"].cumsum().fillna(0)
-            )
-            self.world["total_tests"] = (
-                self.world.groupby("location")["new_tests"].cumsum().fillna(0)
-            )
-            self.world["total_cases_per_ten_thousand"] = (
-                self.world["total_cases"] / self.world["population"] * 10000
-            ).round(decimals=3)
-            self.world["total_deaths_per_ten_thousand"] = (
-                self.world["total_deaths"] / self.world["population"] * 10000
-            ).round(decimals=3)
-            self.world["cfr"] = (
-                self.world["total_deaths"] / self.world["total_cases"]
-            ).round(decimals=3)
-            self.world["new_tests_smoothed_per_ten_thousand"] = (
-                self.world["new_tests_smoothed"] / self.world["population"] * 10000
-            ).round(decimals=3)
-            self.world["date_label"] = pd.to_datetime(self.world["date"]).dt.strftime(
-                "%d. %m."
-            )
-            # Put in per-country dict to avoid doing this with every callback
-            tmp = {}
-            self.world_no_na = {}
-            for country in self.world["location"].unique():
-                tmp[country] = self.world[self.world["location"] == country].copy()
-                self.world_no_na[country] = (
-                    self.world[self.world["location"] == country]
-                    .copy()
-                    .dropna(
-                        subset=["new_tests_smoothed_per_ten_thousand", "positive_rate"]
-                    )
-                )
-            self.world = tmp
+        return {
+            location: df.iloc[start:end]
+            for location, start, end in zip(locations, starts, ends)
+        }
 
     def __get_iso(self, df):
-        isos = []
-        updated_today = []
-        for _, row in df.iterrows():
-            t = row["Time"]
-
-            if len(t) == 4:
-                t = "0" + t
-            if len(t) == 5:
-                t += ":00"
+        # The times (H:MM, HH:MM or HH:MM:SS) are local Swiss times
+        time = df["Time"].astype(str).str.strip()
+        time = time.where(time.str.count(":") == 2, time + ":00")
 
-            iso = datetime.fromisoformat(str(row["Date"].date()) + "T" + t)
-            isos.append(iso)
-            updated_today.append(iso.date() == datetime.today().date())
+        df["ISO"] = (
+            df["Date"] + pd.to_timedelta(time, errors="coerce")
+        ).dt.tz_localize("Europe/Zurich", ambiguous="NaT", nonexistent="NaT")
 
-        df["ISO"] = isos
-        df["Updated_Today"] = updated_today
+        today = pd.Timestamp(datetime.now(timezone("Europe/Zurich")).date())
+        df["Updated_Today"] = df["Date"].dt.normalize() == today
 
         return df
 
@@ -378,7 +638,7 @@ class DataLoader:
         df = df.groupby("Day").sum()
         df = df.T
         df.drop(
-            df.columns.difference([c for c in [*self.cfg["countries"].get()]]),
+            df.columns.difference([c for c in [*self.cfg.countries]]),
             1,
             inplace=True,
         )
@@ -400,6 +660,9 @@ class DataLoader:
         return tmp
 
     def __get_regression(self, x, y):
+        # scipy.stats takes longer to import than everything else together
+        from scipy import stats
+
         df = pd.DataFrame([x, y])
         df = df.dropna(axis=1, how="any")
         slope, intercept, r_value, p_value, std_err = stats.linregress(
@@ -428,28 +691,61 @@ class DataLoader:
         return scaled_cases
 
     def __get_moving_total(self, df, days=7):
-        offset = days - 1
-        df_moving_total = df[0:0]
-        for i in range(0, len(df)):
-            start = max(0, i - offset)
-            d = pd.Series(df.iloc[start : i + 1].sum().to_dict())
-            d.name = df.index[i]
-            df_moving_total = df_moving_total.append(d)
+        # Missing values count as zero (like DataFrame.sum), so the first
+        # days - 1 rows are summed over the shorter window that is available
+        df_moving_total = df.fillna(0).rolling(days, min_periods=1).sum()
 
         # Add the label for the date range (previous week)
-        date_labels = []
-        for d in df_moving_total.index.values:
-            today = pd.to_datetime(str(d))
-            date_labels.append(
-                (today - timedelta(days=7)).strftime("%d. %m.")
-                + " – "
-                + today.strftime("%d. %m.")
-            )
-
-        df_moving_total["date_label"] = date_labels
+        dates = pd.DatetimeIndex(df_moving_total.index)
+        df_moving_total["date_label"] = (
+            date_labels(dates - timedelta(days=7)) + " – " + date_labels(dates)
+        )
 
         return df_moving_total
 
+    def __get_map_data(self):
+        settings = {
+            "total_column_name": self.total_column_name,
+            "choropleth": {
+                "geojson_file": self.cfg.settings.choropleth.geojson_file,
+                "feature": self.cfg.settings.choropleth.feature,
+                "center": self.cfg.settings.choropleth.center,
+                "lataxis": self.cfg.settings.choropleth.lataxis,
+                "lonaxis": self.cfg.settings.choropleth.lonaxis,
+            },
+        }
+
+        theme = {"background": self.cfg.theme.background}
+
+        frames = [
+            "swiss_cases_by_date_filled",
+            "swiss_cases_by_date_filled_per_capita",
+            "swiss_fatalities_by_date_filled",
+            "swiss_cases_by_date_diff",
+            "swiss_fatalities_by_date_diff",
+            "swiss_hospitalizations_by_date_diff",
+            "swiss_hospitalizations_by_date_filled",
+            "swiss_cases_updated_mask_by_date",
+        ]
+
+        payload = to_columnar(
+            {name: getattr(self, name) for name in frames},
+            self.swiss_cases_by_date_filled.index,
+        )
+
+        payload.update(
+            {
+                "regional_centres": self.regional_centres,
+                "settings": settings,
+                "theme": theme,
+                "turbo": StyleLoader(self.cfg).turbo,
+                "region_labels": self.region_labels,
+                "region_updates": self.last_updated["Updated_Today"].to_dict(),
+            }
+        )
+
+        return json.dumps(payload)
+
     def __get_regional_centres(self):
-        regions = self.cfg["regions"].get()
+        regions = self.cfg.regions
         return {d["region"]: {"lat": d["lat"], "lon": d["lon"]} for d in regions}
@@ -0,0 +1,476 @@
+import os
+import mmap
+import time
+import json
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import pandas as pd
+from pytz import timezone
+from .data_loader import DataLoader, TODAY
+from .fetcher import Fetcher
+from .metrics import METRICS
+from .config import FrozenConfig, digest
+from .directories import private_directory
+
+# Bumped whenever snapshots of older versions of the DataLoader can no longer
+# be used
+SNAPSHOT_VERSION = 3
+
+METRICS.histogram(
+    "dashcoch_refresh_duration_seconds", "Duration of the data refreshes by outcome"
+)
+METRICS.histogram(
+    "dashcoch_fetch_duration_seconds", "Duration of the downloads of the sources"
+)
+METRICS.counter("dashcoch_fetch_failures_total", "Failed downloads of the sources")
+METRICS.histogram(
+    "dashcoch_loader_node_duration_seconds", "Duration of the DataLoader nodes"
+)
+
+# A refresh builds a complete DataLoader off to the side, validates it and then
+# publishes it with a single reference assignment. Readers call get() once and
+# keep using the returned snapshot, so they never mix two generations. Sources
+# are fetched through an on-disk cache and only the parts of the DataLoader
+# depending on changed sources are recomputed, nothing if none changed. The
+# sources are downloaded in parallel and the first snapshot is already built
+# while they are coming in, each node waiting for its own sources. With
+# defer set, the lazy sections not built yet are left out (and not even
+# downloaded), the next refresh adds them.
+#
+# A source failing to download is replaced by its last good copy, so it does
+# not hold back the others. It is only tried again after a backoff doubling
+# with every further failure. Nodes failing to build keep the data of the
+# previous snapshot, see DataLoader. The status of every source is available
+# from get_status().
+#
+# With a directory set, every refreshed snapshot is also written there and the
+# other processes pointing to the same directory pick it up. The numpy buffers
+# of the frames are stored out-of-band in a separate file which is memory
+# mapped read-only, so all the workers share one copy of the data. Like the
+# directory of the snapshot file, it has to be private to the user running the
+# app (see private_directory).
+#
+# With a snapshot file set, the last complete snapshot is also saved there.
+# After a restart, restore() serves it until the first refresh is done.
+class DataStore:
+    def __init__(
+        self,
+        cfg: FrozenConfig,
+        directory: str = None,
+        poll_interval: float = 1.0,
+        snapshot: str = None,
+    ):
+        self.cfg = cfg
+        self.directory = directory
+        self.snapshot = snapshot
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.last_refresh = None
+        self.last_error = None
+        self.__snapshot = None
+        self.__refresh_lock = threading.Lock()
+        self.__load_lock = threading.Lock()
+        self.__last_poll = 0.0
+        self.__fetcher = None
+        self.__fetch_pool = None
+        # Sources that changed since the current snapshot was built
+        self.__changed = set()
+        self.__sources_status = {}
+        # Number of refreshes by outcome and the seconds spent on them
+        self.refresh_metrics = {
+            "published": 0,
+            "unchanged": 0,
+            "failed": 0,
+            "seconds": 0.0,
+            "last_seconds": None,
+            "last_outcome": None,
+        }
+        self.__today = None
+
+        if self.directory is not None:
+            private_directory(self.directory)
+
+    def get(self):
+        if self.directory is not None:
+            self.__poll()
+        return self.__snapshot
+
+    def wait(self, timeout: float = None):
+        # Polls more often than get() as long as there is nothing to serve
+        start = time.monotonic()
+        while True:
+            if self.directory is not None:
+                self.__poll(force=True)
+            if self.__snapshot is not None:
+                return True
+            if timeout is not None and time.monotonic() - start > timeout:
+                return False
+            time.sleep(0.05)
+
+    def restore(self):
+        if self.snapshot is None:
+            return False
+
+        with self.__refresh_lock:
+            try:
+                private_directory(os.path.dirname(os.path.abspath(self.snapshot)))
+                with open(self.snapshot, "rb") as f:
+                    version = pickle.load(f)
+                    if version != self.__version():
+                        print(
+                            "Ignoring the snapshot of another version " + repr(version)
+                        )
+                        return False
+                    snapshot = pickle.load(f)
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                print("Restoring the snapshot failed: " + repr(e))
+                return False
+
+            generation = max(self.generation, self.__published_generation()) + 1
+            vars(snapshot)["cfg"] = self.cfg
+            vars(snapshot)["generation"] = generation
+
+            if self.directory is not None:
+                self.__publish(snapshot)
+
+            self.__snapshot = snapshot
+            self.generation = generation
+            # The sources may have changed while nothing was running, so the
+            # first refresh recomputes everything
+            self.__changed = set(DataLoader.get_sources(self.cfg))
+            return True
+
+    def refresh(self, defer: bool = False, sources: set = None):
+        # Only the given sources are requested, the others are taken from the
+        # cache if they are there
+        with self.__refresh_lock:
+            start = time.perf_counter()
+            outcome = self.__refresh(defer, sources)
+            seconds = time.perf_counter() - start
+
+            metrics = self.refresh_metrics
+            metrics[outcome] += 1
+            metrics["seconds"] += seconds
+            metrics["last_seconds"] = seconds
+            metrics["last_outcome"] = outcome
+            METRICS.observe(
+                "dashcoch_refresh_duration_seconds", seconds, {"outcome": outcome}
+            )
+
+            if self.directory is not None:
+                status = {"sources": self.__sources_status, "refresh": metrics}
+                self.__write(
+                    "status.json", lambda f: f.write(json.dumps(status).encode())
+                )
+
+            return outcome == "published"
+
+    def __refresh(self, defer, only):
+        generation = max(self.generation, self.__published_generation()) + 1
+        downloads = {}
+        try:
+            deferred = []
+            if defer:
+                deferred = DataLoader.get_deferred(self.cfg, self.__snapshot)
+
+            downloads = self.__fetch(deferred, only)
+
+            # Without a previous snapshot everything is built anyway, the
+            # DataLoader takes the sources as they are downloaded
+            if self.__snapshot is not None:
+                wait(downloads.values())
+
+                if not self.__changed and not self.__snapshot.deferred:
+                    return "unchanged"
+
+            snapshot = DataLoader(
+                self.cfg,
+                sources=downloads,
+                generation=generation,
+                previous=self.__snapshot,
+                changed=self.__changed,
+                deferred=deferred,
+            )
+            self.__validate(snapshot)
+        except Exception as e:
+            self.last_error = e
+            print(
+                "Data refresh failed, keeping generation "
+                + str(self.generation)
+                + ": "
+                + repr(e)
+            )
+            return "failed"
+        finally:
+            # A download must not outlive its refresh, the next one would
+            # write the same files
+            wait(downloads.values())
+
+        if self.directory is not None:
+            self.__publish(snapshot)
+
+        if self.snapshot is not None and not snapshot.pending:
+            self.__save(snapshot)
+
+        for name, seconds in snapshot.timings.items():
+            METRICS.observe(
+                "dashcoch_loader_node_duration_seconds", seconds, {"node": name}
+            )
+
+        self.__snapshot = snapshot
+        self.generation = snapshot.generation
+        self.last_refresh = datetime.now()
+        self.last_error = None
+        self.__changed = set()
+        return "published"
+
+    def __fetch(self, deferred, only):
+        settings = self.cfg.settings.fetch
+        if self.__fetcher is None:
+            self.__fetcher = Fetcher(
+                self.cfg.settings.cache,
+                timeout=settings.timeout,
+                retries=settings.retries,
+                retry_delay=settings.retry_delay,
+            )
+            self.__fetch_pool = ThreadPoolExecutor(
+                max_workers=settings.workers, thread_name_prefix="fetch"
+            )
+
+        def fetch(name):
+            url = self.cfg.urls[name]
+            cached = self.__fetcher.cached(name, url)
+            if name not in self.__sources_status:
+                # A copy from a previous run is as old as its file
+                self.__sources_status[name] = {
+                    "last_success": os.path.getmtime(cached) if cached else None,
+                    "failures": 0,
+                    "error": None,
+                    "retry_at": 0,
+                }
+            status = self.__sources_status[name]
+
+            if only is not None and name not in only and cached is not None:
+                return cached
+
+            now = time.time()
+            if status["retry_at"] > now:
+                if cached is None:
+                    raise OSError("Waiting to retry " + name + ": " + status["error"])
+                return cached
+
+            try:
+                with METRICS.time("dashcoch_fetch_duration_seconds", {"source": name}):
+                    path, changed = self.__fetcher.fetch(
+                        name, url, settings.timeouts.get(name)
+                    )
+            except Exception as e:
+                METRICS.inc("dashcoch_fetch_failures_total", {"source": name})
+                status["failures"] += 1
+                status["error"] = repr(e)
+                status["retry_at"] = now + min(
+                    settings.backoff * 2 ** (status["failures"] - 1),
+                    settings.backoff_max,
+                )
+                print("Fetching " + name + " failed: " + repr(e))
+                if cached is None:
+                    raise
+                return cached
+
+            status.update(last_success=now, failures=0, error=None, retry_at=0)
+            if changed:
+                self.__changed.add(name)
+            return path
+
+        downloads = {
+            name: self.__fetch_pool.submit(fetch, name)
+            for name in DataLoader.get_sources(self.cfg, deferred)
+        }
+
+        today = datetime.now(timezone("Europe/Zurich")).date()
+        if today != self.__today:
+            self.__changed.add(TODAY)
+            self.__today = today
+
+        return downloads
+
+    def get_status(self):
+        # The sources and refreshes as seen by the process refreshing the data
+        published = {"sources": self.__sources_status, "refresh": self.refresh_metrics}
+        if self.__fetcher is None and self.directory is not None:
+            try:
+                with open(self.__path("status.json")) as f:
+                    published = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        now = time.time()
+        sources = {}
+        for name, source in published["sources"].items():
+            if source["failures"] == 0:
+                state = "ok"
+            elif source["last_success"] is not None:
+                state = "stale"
+            else:
+                state = "failed"
+
+            sources[name] = {
+                "status": state,
+                "age": now - source["last_success"] if source["last_success"] else None,
+                "failures": source["failures"],
+                "error": source["error"],
+                "retry_in": max(source["retry_at"] - now, 0),
+            }
+        return {"sources": sources, "refresh": published["refresh"]}
+
+    def __validate(self, snapshot):
+        # The sections are left out while their nodes are pending, but there
+        # is nothing to show without the core data and the latest updates
+        for name, build in DataLoader.get_nodes(self.cfg).items():
+            if name in snapshot.pending and name not in snapshot.deferred:
+                if build.show is None or build.show == "updates":
+                    raise ValueError(
+                        "No " + name + " data: " + snapshot.failed.get(name, "")
+                    )
+
+        if snapshot.swiss_cases.empty or snapshot.swiss_fatalities.empty:
+            raise ValueError("No Swiss case or fatality data")
+
+        if self.cfg.show.updates and snapshot.last_updated.empty:
+            raise ValueError("No data on the latest updates")
+
+        if (
+            self.cfg.show.international
+            and "world" not in snapshot.pending
+            and len(snapshot.world) == 0
+        ):
+            raise ValueError("No international data")
+
+    def __version(self):
+        # Snapshots with other sections, built with another configuration or
+        # pickled by another pandas version are not restored. Nodes without
+        # sources (like the regional centres) are only built from the
+        # configuration, they would keep the values of the old one forever.
+        return (
+            SNAPSHOT_VERSION,
+            pd.__version__,
+            tuple(DataLoader.get_nodes(self.cfg)),
+            digest(self.cfg),
+        )
+
+    def __save(self, snapshot):
+        tmp = self.snapshot + ".tmp" + str(os.getpid())
+        try:
+            private_directory(os.path.dirname(os.path.abspath(self.snapshot)))
+            with open(tmp, "wb") as f:
+                pickle.dump(self.__version(), f)
+                pickle.dump(snapshot, f, protocol=5)
+            os.replace(tmp, self.snapshot)
+        except OSError as e:
+            print("Saving the snapshot failed: " + repr(e))
+
+    #
+    # Sharing snapshots between processes
+    #
+    def __path(self, name):
+        return os.path.join(self.directory, name)
+
+    def __write(self, name, write):
+        # Always write a new file and rename it, files that are already
+        # mapped by other processes must never change
+        tmp = self.__path(name + ".tmp" + str(os.getpid()))
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, self.__path(name))
+
+    def __published_generation(self):
+        if self.directory is None:
+            return 0
+
+        try:
+            with open(self.__path("generation")) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def __publish(self, snapshot):
+        buffers = []
+        payload = pickle.dumps(snapshot, protocol=5, buffer_callback=buffers.append)
+
+        layout = []
+
+        def write_buffers(f):
+            for buffer in buffers:
+                raw = buffer.raw()
+                # Keep the numpy buffers aligned
+                f.write(b"\0" * (-f.tell() % 64))
+                layout.append((f.tell(), raw.nbytes))
+                f.write(raw)
+
+        prefix = "snapshot-" + str(snapshot.generation)
+        self.__write(prefix + ".buffers", write_buffers)
+        self.__write(
+            prefix + ".pickle",
+            lambda f: pickle.dump((self.__version(), layout, payload), f),
+        )
+        self.__write("generation", lambda f: f.write(str(snapshot.generation).encode()))
+
+        # Processes still loading the previous generation may need its files
+        for name in os.listdir(self.directory):
+            if name.startswith("snapshot-") and name.split(".")[0] not in (
+                prefix,
+                "snapshot-" + str(self.generation),
+            ):
+                try:
+                    os.remove(self.__path(name))
+                except OSError:
+                    pass
+
+    def __poll(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.__last_poll < self.poll_interval:
+            return
+
+        # Only one greenlet / thread per process loads a new generation
+        if not self.__load_lock.acquire(blocking=False):
+            return
+
+        try:
+            self.__last_poll = now
+            generation = self.__published_generation()
+            if generation == 0 or generation == self.generation:
+                return
+
+            self.__snapshot = self.__load(generation)
+            self.generation = generation
+            self.last_refresh = datetime.now()
+        except Exception as e:
+            self.last_error = e
+            print("Loading generation " + str(generation) + " failed: " + repr(e))
+        finally:
+            self.__load_lock.release()
+
+    def __load(self, generation):
+        prefix = "snapshot-" + str(generation)
+
+        private_directory(self.directory)
+        with open(self.__path(prefix + ".pickle"), "rb") as f:
+            version, layout, payload = pickle.load(f)
+        if version != self.__version():
+            raise ValueError("Snapshot of another version " + repr(version))
+
+        with open(self.__path(prefix + ".buffers"), "rb") as f:
+            if layout:
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                view = memoryview(b"")
+
+        snapshot = pickle.loads(
+            payload, buffers=[view[offset : offset + size] for offset, size in layout]
+        )
+        vars(snapshot)["cfg"] = self.cfg
+        return snapshot
@@ -0,0 +1,27 @@
+import os
+import stat
+
+
+# Creates a directory only the current user can write to, or checks that an
+# existing one is. Anybody able to put files into the directories of the app
+# could swap the sources it parses or the pickles it loads, or plant symlinks
+# where it writes. The directories above it must not be replaceable by others
+# either, shared ones like /tmp need the sticky bit.
+def private_directory(path: str):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    path = os.path.realpath(path)
+
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(path + " is writable by other users")
+
+    parent = os.path.dirname(path)
+    while True:
+        info = os.stat(parent)
+        if info.st_uid not in (0, os.getuid()) or (
+            info.st_mode & 0o022 and not info.st_mode & stat.S_ISVTX
+        ):
+            raise PermissionError(path + " can be replaced by other users")
+        if parent == os.path.dirname(parent):
+            return path
+        parent = os.path.dirname(parent)
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# The values of a trace given per point, taken along with x and y
+POINT_KEYS = ("x", "y", "text", "hovertext", "customdata")
+
+
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): the indices of points of
+# the series (x, y) that keep its visual shape. The first and the last point
+# are always kept. The others are split into points - 2 buckets and each
+# bucket contributes the point forming the largest triangle with the one
+# picked from the bucket before and the mean of the bucket after. x has to be
+# sorted. The triangles are measured on y interpolated over its missing
+# values, but a missing point is only picked when its whole bucket is missing.
+# The areas of the triangles of the picked points are returned along with
+# them (0 for the first and the last point and for missing ones).
+def lttb(x: np.ndarray, y: np.ndarray, points: int):
+    length = len(x)
+    if points >= length or points < 3:
+        return np.arange(length), np.zeros(length)
+
+    missing = np.isnan(y)
+    if missing.all():
+        y = np.zeros(length)
+    elif missing.any():
+        y = np.interp(x, x[~missing], y[~missing])
+    edges = np.linspace(1, length - 1, points - 1).astype(int)
+    counts = np.diff(edges)
+    # The means of the buckets, followed by the last point
+    next_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    next_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    indices = np.empty(points, dtype=int)
+    indices[0] = 0
+    indices[-1] = length - 1
+    largest = np.zeros(points)
+
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        a = indices[bucket]
+        areas = np.abs(
+            (x[a] - next_x[bucket + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y[bucket + 1] - y[a])
+        )
+        areas[missing[start:end]] = -np.inf
+        picked = areas.argmax()
+        indices[bucket + 1] = start + picked
+        largest[bucket + 1] = max(areas[picked], 0)
+
+    return indices, largest
+
+
+# Reduces the line traces of a figure in place to a budget of points along x.
+# Traces sharing their x values keep the same ones, so they still line up in a
+# unified hover label. All of them are split into the same LTTB buckets and
+# each bucket keeps one of the points picked by the traces: the one missing
+# in the fewest traces, then the one picked by the most traces and then the one
+# forming the largest triangle, so every bucket is still represented. Bars are
+# left as they are, as are the line traces sharing their x values with bars.
+def downsample_figure(figure: dict, points: int):
+    # The traces often share the same x object
+    converted = {}
+
+    groups = {}
+    for trace in figure["data"]:
+        if "x" not in trace or "y" not in trace or len(trace["x"]) <= points:
+            continue
+
+        if id(trace["x"]) not in converted:
+            converted[id(trace["x"])] = _as_float(trace["x"])
+        x = converted[id(trace["x"])]
+        y = _as_float(trace["y"])
+        if x is None or y is None or len(x) != len(y):
+            continue
+
+        group = groups.setdefault(x.tobytes(), {"x": x, "traces": []})
+        group["traces"].append((trace, y))
+
+    for group in groups.values():
+        traces = group["traces"]
+        if any(trace.get("type", "scatter") != "scatter" for trace, _ in traces):
+            continue
+
+        # The index picked by each trace and its triangle, per bucket
+        picked, areas = map(
+            np.array, zip(*[lttb(group["x"], y, points) for _, y in traces])
+        )
+        # For the pick of each trace, the number of traces having a value at
+        # that index, the number of traces picking it and the largest of their
+        # triangles. Of the picks with the most values and then the most
+        # votes, the one with the largest triangle wins the bucket.
+        valid = (~np.isnan([y for _, y in traces])).sum(axis=0)[picked]
+        same = picked[:, None, :] == picked[None, :, :]
+        votes = same.sum(axis=1)
+        largest = np.where(same, areas[None, :, :], -np.inf).max(axis=1)
+        votes[valid < valid.max(axis=0)] = -1
+        largest[votes < votes.max(axis=0)] = -np.inf
+        indices = picked[largest.argmax(axis=0), np.arange(picked.shape[1])]
+
+        for trace, _ in traces:
+            length = len(trace["x"])
+            for key in POINT_KEYS:
+                if key in trace and _is_array(trace[key], length):
+                    trace[key] = _take(trace[key], indices)
+
+
+# Numbers or dates (as nanoseconds) as a float array, None for anything else
+def _as_float(values):
+    try:
+        return np.asarray(values, dtype=float)
+    except (ValueError, TypeError):
+        pass
+
+    try:
+        dates = pd.to_datetime(values)
+    except (ValueError, TypeError):
+        return None
+    return np.asarray(dates, dtype="datetime64[ns]").astype(np.int64).astype(float)
+
+
+def _is_array(values, length):
+    if isinstance(values, (str, dict)) or not hasattr(values, "__len__"):
+        return False
+    return len(values) == length
+
+
+def _take(values, indices):
+    if isinstance(values, pd.Series):
+        return values.iloc[indices]
+    if isinstance(values, (pd.Index, np.ndarray)):
+        return values[indices]
+    return [values[i] for i in indices]
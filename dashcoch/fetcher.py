@@ -0,0 +1,135 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import urllib.request
+from http.client import HTTPException
+from urllib.error import HTTPError
+from .directories import private_directory
+
+
+# Downloads the source files into a local cache directory. Known files are
+# requested conditionally (ETag / Last-Modified), so unchanged sources are
+# answered with a 304 and the cached copy is used. Local paths are read in
+# place and are considered changed when their modification time changes.
+#
+# Downloads failing with a network error, a timeout or a server error are
+# retried, waiting retry_delay seconds before the first retry and twice as
+# long before each further one. The fetches of different sources may run in
+# parallel threads. The cache directory has to be private to the user running
+# the app (see private_directory).
+class Fetcher:
+    def __init__(
+        self,
+        directory: str,
+        timeout: float = 60,
+        retries: int = 2,
+        retry_delay: float = 1,
+    ):
+        self.directory = directory
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        private_directory(self.directory)
+
+    def fetch(self, name: str, url: str, timeout: float = None):
+        if not url.startswith("http://") and not url.startswith("https://"):
+            return self.__fetch_local(name, url)
+
+        attempt = 0
+        while True:
+            try:
+                return self.__fetch_http(name, url, timeout or self.timeout)
+            except (OSError, HTTPException) as e:
+                # Client errors will not go away by asking again
+                client_error = isinstance(e, HTTPError) and e.code < 500
+                if client_error or attempt >= self.retries:
+                    raise
+                print("Fetching " + name + " failed, retrying: " + repr(e))
+                time.sleep(self.retry_delay * 2 ** attempt)
+                attempt += 1
+
+    def cached(self, name: str, url: str):
+        # The last good copy of a source, None if there is none
+        if not url.startswith("http://") and not url.startswith("https://"):
+            return url if os.path.exists(url) else None
+
+        path = os.path.join(self.directory, name + ".csv")
+        if os.path.exists(path) and self.__read_meta(name).get("url") == url:
+            return path
+        return None
+
+    def __fetch_http(self, name, url, timeout):
+        path = os.path.join(self.directory, name + ".csv")
+        meta = self.__read_meta(name)
+
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        if os.path.exists(path) and meta.get("url") == url:
+            if meta.get("etag"):
+                request.add_header("If-None-Match", meta["etag"])
+            if meta.get("last_modified"):
+                request.add_header("If-Modified-Since", meta["last_modified"])
+
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except HTTPError as e:
+            if e.code == 304:
+                return path, False
+            raise
+
+        with response:
+            stream = response
+            if response.headers.get("Content-Encoding") == "gzip":
+                stream = gzip.GzipFile(fileobj=response)
+
+            tmp = path + ".tmp" + str(os.getpid())
+            with open(tmp, "wb") as f:
+                shutil.copyfileobj(stream, f)
+            os.replace(tmp, path)
+
+            digest = self.__digest(path)
+            self.__write_meta(
+                name,
+                {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "sha1": digest,
+                },
+            )
+
+        # Servers without validators always answer with the full file
+        return path, digest != meta.get("sha1") or url != meta.get("url")
+
+    def __fetch_local(self, name, path):
+        meta = self.__read_meta(name)
+        stat = os.stat(path)
+        changed = meta.get("url") != path or meta.get("mtime") != stat.st_mtime
+
+        if changed:
+            self.__write_meta(name, {"url": path, "mtime": stat.st_mtime})
+
+        return path, changed
+
+    def __digest(self, path):
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def __read_meta(self, name):
+        try:
+            with open(os.path.join(self.directory, name + ".json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_meta(self, name, meta):
+        path = os.path.join(self.directory, name + ".json")
+        tmp = path + ".tmp" + str(os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
@@ -0,0 +1,105 @@
+import json
+import threading
+from functools import wraps
+from collections import OrderedDict
+from plotly.utils import PlotlyJSONEncoder
+from .config import FrozenConfig, digest
+from .directories import private_directory
+from .metrics import METRICS
+
+METRICS.counter(
+    "dashcoch_figure_cache_requests_total", "Figures taken from the cache or built"
+)
+
+
+# Memoizes the figures returned by the callbacks. The key contains the data
+# snapshot and the language (from the context function) besides the name of
+# the callback and its inputs, so a data refresh invalidates all the figures
+# without any explicit clearing. Each process keeps a bounded LRU of the
+# figures it used, optionally backed by a flask_caching backend (filesystem or
+# redis) shared by all the workers. The keys of the backend are prefixed with
+# the digest of the configuration, so deployments sharing it with another
+# configuration never get each other's figures. The filesystem backend
+# pickles its entries, so its directory has to be private to the user running
+# the app (see private_directory).
+#
+# Figures are stored as they are sent to the browser, serialized to JSON, so
+# they do not pin the frames of an old snapshot. Every get() decodes its own
+# copy, which the caller is free to change.
+class FigureCache:
+    def __init__(self, cfg: FrozenConfig, server=None, context=None):
+        settings = cfg.settings.figure_cache
+        self.size = settings.size
+        self.context = context
+        self.hits = 0
+        self.misses = 0
+        self.__figures = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__backend = None
+        # Not every backend supports CACHE_KEY_PREFIX (filesystem does not)
+        self.__backend_prefix = digest(cfg) + ":"
+
+        backend = settings.backend
+        if backend:
+            from flask_caching import Cache
+
+            if backend == "filesystem":
+                private_directory(settings.directory)
+
+            self.__backend = Cache(
+                server,
+                config={
+                    "CACHE_TYPE": backend,
+                    "CACHE_DIR": settings.directory,
+                    "CACHE_REDIS_URL": settings.redis_url,
+                    "CACHE_THRESHOLD": self.size,
+                    "CACHE_DEFAULT_TIMEOUT": settings.timeout,
+                    "CACHE_KEY_PREFIX": "dashcoch-figure:",
+                },
+            )
+
+    def memoize(self, name: str = None):
+        def decorator(f):
+            prefix = name or f.__name__
+
+            @wraps(f)
+            def wrapper(*args):
+                context = self.context() if self.context is not None else ()
+                key = json.dumps([prefix, context, args], default=str)
+                return self.get(key, lambda: f(*args))
+
+            return wrapper
+
+        return decorator
+
+    def get(self, key: str, build):
+        with self.__lock:
+            if key in self.__figures:
+                self.__figures.move_to_end(key)
+                self.hits += 1
+                METRICS.inc("dashcoch_figure_cache_requests_total", {"result": "hit"})
+                return json.loads(self.__figures[key])
+
+        serialized = None
+        if self.__backend is not None:
+            serialized = self.__backend.get(self.__backend_prefix + key)
+
+        if serialized is None:
+            serialized = json.dumps(build(), cls=PlotlyJSONEncoder)
+            if self.__backend is not None:
+                self.__backend.set(self.__backend_prefix + key, serialized)
+            with self.__lock:
+                self.misses += 1
+            METRICS.inc("dashcoch_figure_cache_requests_total", {"result": "miss"})
+        else:
+            with self.__lock:
+                self.hits += 1
+            METRICS.inc("dashcoch_figure_cache_requests_total", {"result": "hit"})
+
+        with self.__lock:
+            self.__figures[key] = serialized
+            self.__figures.move_to_end(key)
+            while len(self.__figures) > self.size:
+                self.__figures.popitem(last=False)
+
+        return json.loads(serialized)
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# Counters and histograms in the Prometheus text format. Metrics are declared
+# once (usually at the top of the module using them) and then updated with
+# their labels as a dict.
+#
+# With a directory set, every process writes its values to its own file there
+# about once a second and render() adds up the files of all processes, so the
+# gunicorn workers and the data publisher show up as one. Files of processes
+# that are gone are kept, counters never go down. gunicorn clears the
+# directory when it starts (see gunicorn.conf.py).
+class Metrics:
+    def __init__(self, flush_interval: float = 1.0):
+        self.flush_interval = flush_interval
+        self.directory = None
+        self.__declared = {}
+        self.__values = {}
+        self.__lock = threading.Lock()
+        self.__pid = os.getpid()
+        self.__file = None
+        self.__flush_pending = False
+
+    def share(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def counter(self, name: str, description: str):
+        self.__declared[name] = ("counter", description, None)
+
+    def histogram(self, name: str, description: str, buckets=DURATION_BUCKETS):
+        self.__declared[name] = ("histogram", description, tuple(buckets))
+
+    def inc(self, name: str, labels: dict = None, value: float = 1):
+        with self.__lock:
+            series = self.__series(name)
+            key = self.__labels(labels)
+            series[key] = series.get(key, 0) + value
+        self.__schedule_flush()
+
+    def observe(self, name: str, value: float, labels: dict = None):
+        buckets = self.__declared[name][2]
+        with self.__lock:
+            series = self.__series(name)
+            key = self.__labels(labels)
+            # Counts per bucket (the last one is +Inf) and the sum
+            counts = series.setdefault(key, [0] * (len(buckets) + 1) + [0.0])
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            counts[index] += 1
+            counts[-1] += value
+        self.__schedule_flush()
+
+    @contextmanager
+    def time(self, name: str, labels: dict = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def flush(self):
+        with self.__lock:
+            self.__check_fork()
+            self.__flush_pending = False
+            if self.directory is None:
+                return
+            if self.__file is None:
+                self.__file = "metrics-%d-%d.json" % (self.__pid, time.time() * 1e6)
+            values = json.dumps(self.__values)
+
+        path = os.path.join(self.directory, self.__file)
+        tmp = path + ".tmp" + str(threading.get_ident())
+        with open(tmp, "w") as f:
+            f.write(values)
+        os.replace(tmp, path)
+
+    def render(self, gauges=()):
+        # Gauges are (name, description, [(labels, value), ...]) of the
+        # rendering process
+        values = self.__collect()
+
+        lines = []
+        for name, (kind, description, buckets) in sorted(self.__declared.items()):
+            lines.append("# HELP " + name + " " + description)
+            lines.append("# TYPE " + name + " " + kind)
+            for labels, value in sorted(values.get(name, {}).items()):
+                if kind == "counter":
+                    lines.append(self.__sample(name, labels, value))
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(buckets + ("+Inf",), value[:-1]):
+                    cumulative += count
+                    le = self.__join(labels, 'le="' + str(bound) + '"')
+                    lines.append(self.__sample(name + "_bucket", le, cumulative))
+                lines.append(self.__sample(name + "_sum", labels, value[-1]))
+                lines.append(self.__sample(name + "_count", labels, cumulative))
+
+        for name, description, samples in gauges:
+            lines.append("# HELP " + name + " " + description)
+            lines.append("# TYPE " + name + " gauge")
+            for labels, value in samples:
+                lines.append(self.__sample(name, self.__labels(labels), value))
+
+        return "\n".join(lines) + "\n"
+
+    def __collect(self):
+        if self.directory is None:
+            with self.__lock:
+                return json.loads(json.dumps(self.__values))
+
+        self.flush()
+        total = {}
+        for file in os.listdir(self.directory):
+            if not file.startswith("metrics-") or not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, file)) as f:
+                    values = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for name, series in values.items():
+                merged = total.setdefault(name, {})
+                for labels, value in series.items():
+                    if labels not in merged:
+                        merged[labels] = value
+                    elif isinstance(value, list):
+                        merged[labels] = [a + b for a, b in zip(merged[labels], value)]
+                    else:
+                        merged[labels] += value
+        return total
+
+    def __series(self, name):
+        self.__check_fork()
+        return self.__values.setdefault(name, {})
+
+    def __check_fork(self):
+        # A forked process starts over with its own file
+        if os.getpid() != self.__pid:
+            self.__pid = os.getpid()
+            self.__values = {}
+            self.__file = None
+            self.__flush_pending = False
+
+    def __schedule_flush(self):
+        if self.directory is None:
+            return
+
+        with self.__lock:
+            if self.__flush_pending:
+                return
+            self.__flush_pending = True
+
+        timer = threading.Timer(self.flush_interval, self.flush)
+        timer.daemon = True
+        timer.start()
+
+    def __labels(self, labels):
+        if not labels:
+            return ""
+        return ",".join(
+            key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+            for key, value in sorted(labels.items())
+        )
+
+    def __join(self, labels, label):
+        return labels + "," + label if labels else label
+
+    def __sample(self, name, labels, value):
+        if labels:
+            name += "{" + labels + "}"
+        return name + " " + repr(float(value))
+
+
+# The metrics of this process
+METRICS = Metrics()
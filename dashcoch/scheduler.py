@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import random
+import threading
+from datetime import datetime
+from .data_loader import DataLoader
+from .data_store import DataStore
+from .metrics import METRICS
+from .config import FrozenConfig, freeze
+from .directories import private_directory
+
+
+# Refreshes the data of a DataStore. Every source is requested at its own
+# interval from settings.schedule.intervals (settings.update_interval for the
+# others), varied randomly by up to the jitter fraction, so the requests of
+# several instances do not line up. Sources that are not due are taken from
+# the download cache. Sources failing to download are due again after their
+# backoff (settings.fetch.backoff). trigger() refreshes all sources right away.
+#
+# With a lock file set, only the process holding an exclusive lock on it
+# refreshes. The others keep trying to get the lock and take over when the
+# leader is gone. Its directory has to be private to the user running the app,
+# anybody able to create the lock file could hold it forever. Processes sharing
+# the directory of the DataStore ask the leader for a refresh through a file in
+# that directory.
+class Scheduler:
+    def __init__(
+        self,
+        cfg: FrozenConfig,
+        data_store: DataStore,
+        lock: str = None,
+        tick: float = 1.0,
+    ):
+        self.cfg = cfg
+        self.data_store = data_store
+        self.lock = lock
+        self.tick = tick
+        self.leader = lock is None
+        if lock is not None:
+            private_directory(os.path.dirname(os.path.abspath(lock)))
+        self.__lock_file = None
+        self.__triggered = threading.Event()
+        # When each source is due next (time.monotonic)
+        self.__due = {}
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def trigger(self):
+        if self.data_store.directory is not None:
+            with open(self.__request_path(), "w"):
+                pass
+        self.__triggered.set()
+
+    def run(self, running=lambda: True):
+        while running():
+            # Nothing restarts the scheduler, it has to keep running whatever
+            # goes wrong in a run
+            try:
+                if self.leader or self.__elect():
+                    self.run_once()
+            except Exception as e:
+                print("Scheduled refresh failed: " + repr(e))
+            self.__triggered.wait(self.tick)
+
+    def run_once(self):
+        # A new leader first serves the data of the last run, if there is any
+        if self.data_store.get() is None and self.data_store.restore():
+            print("Data generation " + str(self.data_store.generation) + " restored")
+            return True
+
+        now = time.monotonic()
+        sources = DataLoader.get_sources(self.cfg)
+        if self.__requested():
+            due = set(sources)
+        else:
+            due = {name for name in sources if self.__due.get(name, 0) <= now}
+
+        if not due:
+            return False
+
+        # Without any data yet, the core data is published first and the lazy
+        # sections right after it
+        try:
+            updated = self.data_store.refresh(
+                defer=self.data_store.get() is None, sources=due
+            )
+        finally:
+            self.__schedule(due, now)
+
+        if updated:
+            print(
+                "Data generation "
+                + str(self.data_store.generation)
+                + " published at "
+                + datetime.now().isoformat()
+            )
+
+            if self.data_store.get().deferred:
+                self.__triggered.set()
+
+        return updated
+
+    def __schedule(self, due, now):
+        # Not a whole interval after a failed download, the first data may
+        # depend on it
+        sources = self.data_store.get_status()["sources"]
+        for name in due:
+            if name in sources and sources[name]["failures"]:
+                self.__due[name] = time.monotonic() + sources[name]["retry_in"]
+            else:
+                self.__due[name] = now + self.__interval(name)
+
+    def __interval(self, name):
+        settings = self.cfg.settings.schedule
+        interval = settings.intervals.get(name, self.cfg.settings.update_interval)
+        return interval * (1 + random.uniform(-settings.jitter, settings.jitter))
+
+    def __elect(self):
+        # Not available on Windows, where there is no shared directory either
+        import fcntl
+
+        if self.__lock_file is None:
+            self.__lock_file = open(self.lock, "a")
+
+        try:
+            fcntl.flock(self.__lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+
+        self.leader = True
+        print("Process " + str(os.getpid()) + " is refreshing the data")
+        return True
+
+    def __request_path(self):
+        return os.path.join(self.data_store.directory, "refresh-requested")
+
+    def __requested(self):
+        requested = self.__triggered.is_set()
+        self.__triggered.clear()
+
+        if self.data_store.directory is not None:
+            try:
+                os.remove(self.__request_path())
+                requested = True
+            except FileNotFoundError:
+                pass
+
+        return requested
+
+
+# The data publisher started by gunicorn (see gunicorn.conf.py), it stops
+# together with gunicorn
+def main():
+    cfg = freeze()
+    directory = sys.argv[1] if len(sys.argv) > 1 else cfg.settings.data_store
+    parent = os.getppid()
+    METRICS.share(os.path.join(directory, "metrics"))
+
+    data_store = DataStore(cfg, directory=directory, snapshot=cfg.settings.snapshot)
+    lock = cfg.settings.schedule.lock or os.path.join(directory, "scheduler.lock")
+    scheduler = Scheduler(cfg, data_store, lock=lock)
+    scheduler.run(running=lambda: os.getppid() == parent)
+
+
+if __name__ == "__main__":
+    main()
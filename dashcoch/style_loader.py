@@ -1,8 +1,8 @@
-import confuse
+from .config import FrozenConfig
 
 
 class StyleLoader:
-    def __init__(self, cfg: confuse.Configuration):
+    def __init__(self, cfg: FrozenConfig):
         self.cfg = cfg
         self.colors = [
             "#7a8871",
@@ -52,9 +52,9 @@ class StyleLoader:
             "#10523e",
         ]
 
-        regions = self.cfg["regions"].get()
+        regions = self.cfg.regions
         self.region_colors = {d["region"]: d["color"] for d in regions}
-        self.theme = self.cfg["theme"].get()
+        self.theme = self.cfg.theme
         self.turbo = self.get_turbo()
 
     def get_turbo(self):
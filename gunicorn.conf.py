@@ -1,3 +1,7 @@
+import os
+import sys
+import shutil
+import subprocess
 import multiprocessing
 
 # workers = multiprocessing.cpu_count() * 2 + 1
@@ -5,3 +9,29 @@ worker_class = "gevent"
 
 # Keep things clean and neat (and leak-free)
 # max_requests = 1200
+
+
+# Load the data in a single process and share it with all the workers instead
+# of having every worker download and process everything on its own
+def when_ready(server):
+    from dashcoch.config import freeze
+
+    cfg = freeze()
+    directory = cfg.settings.data_store
+    os.environ["DASHCOCH_DATA_STORE"] = directory
+
+    # The metrics of the processes of a previous run are dropped, before any
+    # of the new ones writes its file
+    shutil.rmtree(os.path.join(directory, "metrics"), ignore_errors=True)
+
+    # A plain subprocess, the workers forked after it would inherit a
+    # multiprocessing child and fail trying to join it when they exit
+    server.data_publisher = subprocess.Popen(
+        [sys.executable, "-c", "from dashcoch.scheduler import main; main()", directory]
+    )
+
+
+def on_exit(server):
+    if hasattr(server, "data_publisher"):
+        server.data_publisher.terminate()
+        server.data_publisher.wait()
@@ -0,0 +1,150 @@
+import io
+import time
+import gzip
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from dashcoch.config import freeze, FrozenConfig
+from dashcoch.data_loader import COLS
+
+
+# Stands in for the servers of the sources, serving the files in files by
+# their name (/<name>.csv) from 127.0.0.1. With validators set, the files
+# are sent with an ETag and conditional requests for an unchanged file are
+# answered with a 304. With gzip set, the files are compressed for clients
+# accepting it. The next failures[name] requests for a file are answered with
+# a 503, and the ones for a file in delays wait that many seconds before
+# answering. Every request is recorded with its headers and the status it was
+# answered with.
+class SourceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SourceHandler)
+        self.files = {}
+        self.validators = True
+        self.gzip = False
+        self.failures = {}
+        self.delays = {}
+        self.requests = []
+
+    def url(self, name):
+        return "http://127.0.0.1:" + str(self.server_port) + "/" + name + ".csv"
+
+    def statuses(self, name):
+        return [status for path, _, status in self.requests if path == name]
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on slow answers are expected
+        pass
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        name = self.path.strip("/").rsplit(".", 1)[0]
+        time.sleep(server.delays.get(name, 0))
+
+        if server.failures.get(name, 0) > 0:
+            server.failures[name] -= 1
+            self.send_error(503)
+            return
+
+        if name not in server.files:
+            self.send_error(404)
+            return
+
+        content = server.files[name]
+        etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+        if server.validators and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if server.validators:
+            self.send_header("ETag", etag)
+        if server.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            content = gzip.compress(content)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_response(self, code, message=None):
+        # Recorded before answering, the client may look at it right after
+        name = self.path.strip("/").rsplit(".", 1)[0]
+        self.server.requests.append((name, dict(self.headers), code))
+        super().send_response(code, message)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def source_server():
+    server = SourceServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# The sources of the core data (cases, fatalities and demography) over the
+# given number of days, as CSV files
+def core_sources(days=30, seed=0):
+    rng = np.random.default_rng(seed)
+    regions = [column for column in COLS if column not in ("CH", "Date")]
+    dates = pd.date_range("2020-06-01", periods=days).strftime("%Y-%m-%d")
+
+    def cumulative():
+        df = pd.DataFrame({"Date": dates})
+        for region in regions:
+            df[region] = np.cumsum(rng.integers(0, 50, days)).astype(float)
+        df["CH"] = df[regions].sum(axis=1)
+        return df
+
+    demography = pd.DataFrame(
+        {"Population": rng.integers(10000, 1500000, len(regions) + 1)},
+        index=pd.Index(regions + ["CH"], name="Region"),
+    )
+
+    files = {}
+    for name, df, index in [
+        ("cases", cumulative(), False),
+        ("fatalities", cumulative(), False),
+        ("demography", demography, True),
+    ]:
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=index)
+        files[name] = buffer.getvalue().encode()
+    return files
+
+
+# Makes the default configuration with all optional sections switched off, so
+# only the core sources are loaded, from the stand-in server. Keyword
+# arguments replace the fetch settings.
+@pytest.fixture
+def core_config(source_server, tmp_path):
+    source_server.files.update(core_sources())
+
+    def make(**fetch):
+        cfg = freeze()
+        settings = dict(cfg.settings, cache=str(tmp_path / "cache"))
+        settings["fetch"] = dict(cfg.settings.fetch, **fetch)
+        urls = {name: source_server.url(name) for name in source_server.files}
+        return FrozenConfig(
+            dict(
+                cfg,
+                urls=dict(cfg.urls, **urls),
+                show={section: False for section in cfg.show},
+                settings=settings,
+            )
+        )
+
+    return make
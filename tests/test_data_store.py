@@ -0,0 +1,103 @@
+from dashcoch.config import FrozenConfig
+import os
+import stat
+import time
+import pytest
+from dashcoch.data_store import DataStore
+from conftest import core_sources
+
+
+def test_refresh_without_changes_keeps_the_snapshot(core_config, source_server):
+    data_store = DataStore(core_config())
+
+    assert data_store.refresh()
+    snapshot = data_store.get()
+    assert snapshot.generation == 1
+    assert not snapshot.pending
+
+    # All the sources are answered with a 304, nothing is rebuilt
+    assert not data_store.refresh()
+    assert data_store.get() is snapshot
+    assert data_store.refresh_metrics["unchanged"] == 1
+    for name in ("cases", "fatalities", "demography"):
+        assert source_server.statuses(name) == [200, 304]
+
+
+def test_refresh_rebuilds_the_nodes_of_changed_sources(core_config, source_server):
+    data_store = DataStore(core_config())
+    data_store.refresh()
+    snapshot = data_store.get()
+
+    source_server.files["cases"] = core_sources(seed=1)["cases"]
+    assert data_store.refresh()
+
+    refreshed = data_store.get()
+    assert refreshed.generation == 2
+    assert not refreshed.swiss_cases.equals(snapshot.swiss_cases)
+    # The nodes not depending on the cases are taken over as they are
+    assert refreshed.regional_demography is snapshot.regional_demography
+
+
+def test_snapshot_is_restored_with_the_same_configuration(core_config, tmp_path):
+    cfg = core_config()
+    saved = DataStore(cfg, snapshot=str(tmp_path / "snapshot.pickle"))
+    saved.refresh()
+
+    data_store = DataStore(cfg, snapshot=str(tmp_path / "snapshot.pickle"))
+    assert data_store.restore()
+    assert data_store.get().snapshot_id == saved.get().snapshot_id
+
+
+def test_snapshot_of_another_configuration_is_not_restored(core_config, tmp_path):
+    cfg = core_config()
+    DataStore(cfg, snapshot=str(tmp_path / "snapshot.pickle")).refresh()
+
+    # The regional centres only depend on the configuration
+    regions = [dict(region, lat=0.0) for region in cfg.regions]
+    other = FrozenConfig(dict(cfg, regions=regions))
+    data_store = DataStore(other, snapshot=str(tmp_path / "snapshot.pickle"))
+    assert not data_store.restore()
+
+    data_store.refresh()
+    assert all(
+        centre["lat"] == 0.0 for centre in data_store.get().regional_centres.values()
+    )
+
+
+def test_data_directories_are_created_private(core_config, tmp_path):
+    data_store = DataStore(
+        core_config(),
+        directory=str(tmp_path / "private" / "data"),
+        snapshot=str(tmp_path / "private" / "snapshot.pickle"),
+    )
+    data_store.refresh()
+
+    assert stat.S_IMODE(os.stat(tmp_path / "private" / "data").st_mode) == 0o700
+    assert os.path.exists(tmp_path / "private" / "snapshot.pickle")
+
+
+def test_snapshot_is_not_restored_from_a_shared_directory(core_config, tmp_path):
+    cfg = core_config()
+    snapshot = str(tmp_path / "shared" / "snapshot.pickle")
+    DataStore(cfg, snapshot=snapshot).refresh()
+
+    os.chmod(tmp_path / "shared", 0o777)
+    assert not DataStore(cfg, snapshot=snapshot).restore()
+
+    with pytest.raises(PermissionError):
+        DataStore(cfg, directory=str(tmp_path / "shared"))
+
+
+def test_sources_have_their_own_timeout(core_config, source_server):
+    source_server.delays["demography"] = 2
+    cfg = core_config(timeout=30, timeouts={"demography": 0.2}, retries=0)
+    data_store = DataStore(cfg)
+
+    start = time.monotonic()
+    assert not data_store.refresh()
+    assert time.monotonic() - start < 1
+
+    sources = data_store.get_status()["sources"]
+    assert sources["demography"]["status"] == "failed"
+    assert "timed out" in sources["demography"]["error"]
+    assert sources["cases"]["status"] == "ok"
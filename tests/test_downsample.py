@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from dashcoch.downsample import lttb, downsample_figure
+
+POINTS = 50
+
+
+def line_figure(traces=5, length=1000):
+    rng = np.random.default_rng(0)
+    x = pd.date_range("2020-02-25", periods=length)
+    return {
+        "data": [
+            {"x": x, "y": np.cumsum(rng.normal(size=length)), "name": str(i)}
+            for i in range(traces)
+        ],
+        "layout": {},
+    }
+
+
+def bucket_of(x, indices, points):
+    # The LTTB bucket of each index, -1 for the first and the last point
+    edges = np.linspace(1, len(x) - 1, points - 1).astype(int)
+    return np.searchsorted(edges, indices, side="right") - 1
+
+
+def test_single_trace_keeps_its_lttb_points():
+    figure = line_figure(traces=1)
+    x = np.arange(1000, dtype=float)
+    expected, _ = lttb(x, figure["data"][0]["y"], POINTS)
+
+    y = figure["data"][0]["y"]
+    downsample_figure(figure, POINTS)
+    np.testing.assert_array_equal(figure["data"][0]["y"], y[expected])
+
+
+def test_every_bucket_keeps_one_point():
+    figure = line_figure(traces=5)
+    downsample_figure(figure, POINTS)
+
+    x = figure["data"][0]["x"]
+    assert len(x) == POINTS
+    for trace in figure["data"]:
+        assert (trace["x"] == x).all()
+
+    indices = np.asarray((x - pd.Timestamp("2020-02-25")).days)
+    assert indices[0] == 0 and indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+    assert list(bucket_of(np.arange(1000), indices[1:-1], POINTS)) == list(
+        range(POINTS - 2)
+    )
+
+
+def test_bucket_keeps_the_point_most_traces_picked():
+    figure = line_figure(traces=3)
+    # Two traces with the same shape outvote the third one
+    figure["data"][1]["y"] = figure["data"][0]["y"] * 2
+    expected, _ = lttb(np.arange(1000, dtype=float), figure["data"][0]["y"], POINTS)
+
+    y = figure["data"][2]["y"]
+    downsample_figure(figure, POINTS)
+    np.testing.assert_array_equal(figure["data"][2]["y"], y[expected])
+
+
+def test_ties_go_to_the_largest_triangle():
+    figure = line_figure(traces=2)
+    # The triangles of the first trace are far larger
+    figure["data"][0]["y"] = figure["data"][0]["y"] * 1e6
+    expected, _ = lttb(np.arange(1000, dtype=float), figure["data"][0]["y"], POINTS)
+
+    y = figure["data"][1]["y"]
+    downsample_figure(figure, POINTS)
+    np.testing.assert_array_equal(figure["data"][1]["y"], y[expected])
+
+
+def test_traces_sharing_x_with_bars_are_kept():
+    figure = line_figure(traces=2)
+    figure["data"][1]["type"] = "bar"
+    downsample_figure(figure, POINTS)
+
+    assert [len(trace["y"]) for trace in figure["data"]] == [1000, 1000]
+
+
+def test_missing_values_are_not_kept():
+    figure = line_figure(traces=3, length=1200)
+    # Cumulative counts not reported on weekends, but for the last trace
+    weekends = figure["data"][0]["x"].dayofweek >= 5
+    for trace in figure["data"]:
+        trace["y"] = np.cumsum(np.abs(trace["y"]))
+    for trace in figure["data"][:-1]:
+        trace["y"][weekends] = np.nan
+
+    for points in (500, 200):
+        downsampled = {
+            "data": [dict(trace) for trace in figure["data"]],
+            "layout": {},
+        }
+        downsample_figure(downsampled, points)
+        x = downsampled["data"][0]["x"]
+        indices = np.asarray((x - pd.Timestamp("2020-02-25")).days)
+        buckets = bucket_of(np.arange(1200), indices, points)
+        # Only buckets falling on a weekend are left without a value
+        edges = np.linspace(1, 1199, points - 1).astype(int)
+        empty = [weekends[start:end].all() for start, end in zip(edges, edges[1:])]
+        for trace in downsampled["data"]:
+            assert len(trace["y"]) == points
+            missing = np.isnan(trace["y"])
+            assert all(empty[bucket] for bucket in buckets[missing])
+        if points == 200:
+            assert not any(empty)
+
+
+def test_buckets_without_values_keep_one_missing_point():
+    x = np.arange(1000, dtype=float)
+    y = np.cumsum(np.ones(1000))
+    y[300:400] = np.nan
+    indices, areas = lttb(x, y, POINTS)
+
+    assert len(indices) == POINTS
+    assert (np.diff(indices) > 0).all()
+    # The gap still breaks the line
+    assert np.isnan(y[indices]).sum() > 0
+    assert np.isnan(y[indices[(indices < 290) | (indices > 410)]]).sum() == 0
+    assert np.isfinite(areas).all()
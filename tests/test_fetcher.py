@@ -0,0 +1,144 @@
+import os
+import stat
+import time
+from types import SimpleNamespace
+from urllib.error import HTTPError
+import pytest
+import dashcoch.fetcher
+from dashcoch.fetcher import Fetcher
+
+CONTENT = b"Date,CH\n2020-06-01,1\n2020-06-02,3\n"
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unchanged_source_is_reused_after_304(source_server, tmp_path):
+    source_server.files["cases"] = CONTENT
+    fetcher = Fetcher(str(tmp_path))
+
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert changed
+    assert read(path) == CONTENT
+
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert not changed
+    assert read(path) == CONTENT
+    assert source_server.statuses("cases") == [200, 304]
+    assert "If-None-Match" in source_server.requests[-1][1]
+
+
+def test_changed_source_is_downloaded_again(source_server, tmp_path):
+    source_server.files["cases"] = CONTENT
+    fetcher = Fetcher(str(tmp_path))
+    fetcher.fetch("cases", source_server.url("cases"))
+
+    source_server.files["cases"] = CONTENT + b"2020-06-03,4\n"
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert changed
+    assert read(path) == CONTENT + b"2020-06-03,4\n"
+    assert source_server.statuses("cases") == [200, 200]
+
+
+def test_changes_without_validators_are_detected_by_digest(source_server, tmp_path):
+    source_server.validators = False
+    source_server.files["cases"] = CONTENT
+    fetcher = Fetcher(str(tmp_path))
+
+    assert fetcher.fetch("cases", source_server.url("cases"))[1]
+    assert not fetcher.fetch("cases", source_server.url("cases"))[1]
+    assert "If-None-Match" not in source_server.requests[-1][1]
+
+    source_server.files["cases"] = CONTENT.replace(b",3", b",4")
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert changed
+    assert read(path) == CONTENT.replace(b",3", b",4")
+    assert source_server.statuses("cases") == [200, 200, 200]
+
+
+def test_compressed_source_is_decoded(source_server, tmp_path):
+    source_server.gzip = True
+    source_server.files["cases"] = CONTENT
+    fetcher = Fetcher(str(tmp_path))
+
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert changed
+    assert read(path) == CONTENT
+    assert "gzip" in source_server.requests[-1][1]["Accept-Encoding"]
+
+    # The digest is taken from the decoded file
+    assert not fetcher.fetch("cases", source_server.url("cases"))[1]
+
+
+def test_another_url_is_a_change(source_server, tmp_path):
+    source_server.files["cases"] = CONTENT
+    source_server.files["cases_mirror"] = CONTENT
+    fetcher = Fetcher(str(tmp_path))
+
+    fetcher.fetch("cases", source_server.url("cases"))
+    path, changed = fetcher.fetch("cases", source_server.url("cases_mirror"))
+    assert changed
+    assert "If-None-Match" not in source_server.requests[-1][1]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # The delays between the retries, without waiting for them
+    sleeps = []
+    monkeypatch.setattr(dashcoch.fetcher, "time", SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+
+def test_server_errors_are_retried(source_server, tmp_path, sleeps):
+    source_server.files["cases"] = CONTENT
+    source_server.failures["cases"] = 2
+    fetcher = Fetcher(str(tmp_path), retries=2)
+
+    path, changed = fetcher.fetch("cases", source_server.url("cases"))
+    assert changed
+    assert read(path) == CONTENT
+    assert source_server.statuses("cases") == [503, 503, 200]
+
+
+def test_retries_back_off_exponentially(source_server, tmp_path, sleeps):
+    source_server.files["cases"] = CONTENT
+    source_server.failures["cases"] = 5
+    fetcher = Fetcher(str(tmp_path), retries=3, retry_delay=0.5)
+
+    with pytest.raises(HTTPError) as error:
+        fetcher.fetch("cases", source_server.url("cases"))
+    assert error.value.code == 503
+    assert sleeps == [0.5, 1.0, 2.0]
+    assert source_server.statuses("cases") == [503] * 4
+
+
+def test_client_errors_are_not_retried(source_server, tmp_path, sleeps):
+    fetcher = Fetcher(str(tmp_path), retries=3)
+
+    with pytest.raises(HTTPError) as error:
+        fetcher.fetch("cases", source_server.url("cases"))
+    assert error.value.code == 404
+    assert sleeps == []
+    assert source_server.statuses("cases") == [404]
+
+
+def test_timeout_of_a_single_fetch(source_server, tmp_path):
+    source_server.files["world"] = CONTENT
+    source_server.delays["world"] = 2
+    fetcher = Fetcher(str(tmp_path), timeout=30, retries=0)
+
+    start = time.monotonic()
+    with pytest.raises(OSError, match="timed out"):
+        fetcher.fetch("world", source_server.url("world"), timeout=0.2)
+    assert time.monotonic() - start < 1
+
+
+def test_cache_directory_must_be_private(tmp_path):
+    Fetcher(str(tmp_path / "cache"))
+    assert stat.S_IMODE(os.stat(tmp_path / "cache").st_mode) == 0o700
+
+    os.chmod(tmp_path / "cache", 0o777)
+    with pytest.raises(PermissionError):
+        Fetcher(str(tmp_path / "cache"))
@@ -0,0 +1,98 @@
+import os
+import flask
+import pytest
+from dashcoch.config import freeze, FrozenConfig
+from dashcoch.figure_cache import FigureCache
+
+
+def figure_cache_config(directory, size=256, **values):
+    cfg = freeze()
+    settings = dict(cfg.settings)
+    settings["figure_cache"] = dict(
+        cfg.settings.figure_cache,
+        backend="filesystem" if directory else None,
+        directory=directory,
+        size=size,
+    )
+    return FrozenConfig(dict(cfg, settings=settings, **values))
+
+
+def cached_figure(cfg, context, builds):
+    figure_cache = FigureCache(cfg, flask.Flask(__name__), context=lambda: context)
+
+    @figure_cache.memoize()
+    def figure(value):
+        builds.append(value)
+        return {"data": [{"y": [value]}]}
+
+    return figure
+
+
+def test_backend_is_shared_by_the_same_snapshot(tmp_path):
+    cfg = figure_cache_config(str(tmp_path))
+    builds = []
+
+    first = cached_figure(cfg, ("a1b2", 0), builds)
+    second = cached_figure(cfg, ("a1b2", 0), builds)
+    assert first(1) == second(1) == {"data": [{"y": [1]}]}
+    assert builds == [1]
+
+    # Another snapshot with the same generation, e.g. after a restart
+    third = cached_figure(cfg, ("c3d4", 0), builds)
+    third(1)
+    assert builds == [1, 1]
+
+
+def test_backend_is_not_shared_across_configurations(tmp_path):
+    builds = []
+
+    first = cached_figure(figure_cache_config(str(tmp_path)), ("a1b2", 0), builds)
+    other = figure_cache_config(str(tmp_path), countries={"Austria": "AUT"})
+    second = cached_figure(other, ("a1b2", 0), builds)
+
+    first(1)
+    second(1)
+    assert builds == [1, 1]
+
+
+def test_least_recently_used_figures_are_dropped():
+    figure_cache = FigureCache(figure_cache_config(None, size=2))
+    builds = []
+
+    @figure_cache.memoize()
+    def figure(value):
+        builds.append(value)
+        return {"data": [{"y": [value]}]}
+
+    figure(1)
+    figure(2)
+    figure(1)
+    figure(3)
+    assert builds == [1, 2, 3]
+    assert (figure_cache.hits, figure_cache.misses) == (1, 3)
+
+    # 2 was used the longest time ago, 1 and 3 are still there
+    figure(1)
+    figure(3)
+    figure(2)
+    assert builds == [1, 2, 3, 2]
+    assert (figure_cache.hits, figure_cache.misses) == (3, 4)
+
+
+def test_callers_get_their_own_copy():
+    builds = []
+    figure = cached_figure(figure_cache_config(None), ("a1b2", 0), builds)
+
+    figure(1)["data"].append({"y": [2]})
+    assert figure(1) == {"data": [{"y": [1]}]}
+    assert builds == [1]
+
+
+def test_backend_directory_must_be_private(tmp_path):
+    os.mkdir(tmp_path / "shared")
+    os.chmod(tmp_path / "shared", 0o777)
+
+    with pytest.raises(PermissionError):
+        FigureCache(
+            figure_cache_config(str(tmp_path / "shared")), flask.Flask(__name__)
+        )
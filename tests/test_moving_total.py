@@ -0,0 +1,78 @@
+import os
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from dashcoch.data_loader import DataLoader
+
+TEST_CSV = os.path.join(os.path.dirname(__file__), "..", "test.csv")
+
+get_moving_total = DataLoader._DataLoader__get_moving_total
+
+
+# The moving total as it was computed before the rolling window, one appended
+# row at a time (with pd.concat, DataFrame.append is gone from pandas 2)
+def appended_moving_total(df, days=7):
+    offset = days - 1
+    df_moving_total = df[0:0]
+    for i in range(0, len(df)):
+        start = max(0, i - offset)
+        d = pd.Series(df.iloc[start : i + 1].sum().to_dict())
+        d.name = df.index[i]
+        df_moving_total = pd.concat([df_moving_total, d.to_frame().T])
+
+    date_labels = []
+    for d in df_moving_total.index.values:
+        today = pd.to_datetime(str(d))
+        date_labels.append(
+            (today - timedelta(days=7)).strftime("%d. %m.")
+            + " – "
+            + today.strftime("%d. %m.")
+        )
+
+    df_moving_total["date_label"] = date_labels
+
+    return df_moving_total
+
+
+# The daily new cases per location, by date, like swiss_cases_by_date.diff()
+def world_cases():
+    df = pd.read_csv(TEST_CSV)
+    return df.pivot(index="date", columns="location", values="total_cases").diff()
+
+
+# Cantons reporting with gaps, including a first row without any data
+def canton_cases():
+    dates = pd.date_range("2020-02-25", "2020-04-30").strftime("%Y-%m-%d")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        rng.integers(0, 100, (len(dates), 4)).astype(float),
+        index=pd.Index(dates, name="Date"),
+        columns=["ZH", "BE", "TI", "CH"],
+    )
+    df[rng.random(df.shape) < 0.2] = np.nan
+    return df.cumsum().diff()
+
+
+@pytest.mark.parametrize(
+    "df",
+    [
+        world_cases(),
+        canton_cases(),
+        canton_cases().iloc[:4],
+        canton_cases().iloc[:0],
+    ],
+    ids=["world", "cantons", "short", "empty"],
+)
+@pytest.mark.parametrize("days", [1, 7, 14])
+def test_moving_total_matches_append_loop(df, days):
+    expected = appended_moving_total(df, days)
+    actual = get_moving_total(None, df, days)
+
+    assert list(actual.index) == list(expected.index)
+    assert list(actual.columns) == list(expected.columns)
+    assert actual["date_label"].tolist() == expected["date_label"].tolist()
+    np.testing.assert_allclose(
+        actual.drop(columns="date_label").to_numpy(dtype=float),
+        expected.drop(columns="date_label").to_numpy(dtype=float),
+    )
@@ -0,0 +1,65 @@
+import os
+import time
+import pytest
+from dashcoch.config import freeze
+from dashcoch.data_store import DataStore
+from dashcoch.scheduler import Scheduler
+
+
+# A data store whose refreshes fail with an error DataStore does not catch,
+# like a full disk while publishing
+class BrokenDataStore:
+    directory = None
+
+    def __init__(self):
+        self.refreshes = 0
+
+    def get(self):
+        return None
+
+    def restore(self):
+        return False
+
+    def refresh(self, defer=False, sources=None):
+        self.refreshes += 1
+        raise OSError(28, "No space left on device")
+
+    def get_status(self):
+        return {"sources": {}, "refresh": {}}
+
+
+def test_errors_do_not_stop_the_scheduler():
+    data_store = BrokenDataStore()
+    scheduler = Scheduler(freeze(), data_store, tick=0.01)
+    runs = iter(range(3))
+
+    def running():
+        scheduler.trigger()
+        return next(runs, None) is not None
+
+    scheduler.run(running)
+    assert data_store.refreshes == 3
+
+
+def test_failed_sources_are_retried_after_their_backoff(core_config, source_server):
+    source_server.failures["cases"] = 1
+    cfg = core_config(retries=0, backoff=0.2)
+    scheduler = Scheduler(cfg, DataStore(cfg))
+
+    assert not scheduler.run_once()
+    # The sources downloaded are only due after their interval
+    assert not scheduler.run_once()
+
+    time.sleep(0.3)
+    assert scheduler.run_once()
+    assert source_server.statuses("cases") == [503, 200]
+    assert source_server.statuses("demography") == [200]
+
+
+def test_lock_must_be_in_a_private_directory(tmp_path):
+    os.mkdir(tmp_path / "shared")
+    os.chmod(tmp_path / "shared", 0o777)
+    cfg = freeze()
+
+    with pytest.raises(PermissionError):
+        Scheduler(cfg, DataStore(cfg), lock=str(tmp_path / "shared" / "lock"))